@@ -12,10 +12,13 @@ from .cacheutils import *
 from ._strutils import *
 from ._wraputils import *
 from ._poolutils import *
+from ._limitutils import *
 from .schemautils import *
 from ._cmdutils import *
 from ._timeparse import *
 from ._containerutils import *
+from ._jsonutils import *
+from ._hashutils import *
 
 
 __all__ = (
@@ -25,21 +28,36 @@ __all__ = (
 
     "Singleton", "Cached", "UserConfig", "LocalCache", "g", "Config",
 
-    "gen_ident", "gen_unique_ident", "camel2under", "under2camel", "number", "str2md5",
+    "gen_ident", "gen_unique_ident", "camel2under", "under2camel", "number", "numbers", "str2md5",
+    "cached_camel2under", "cached_under2camel", "camelize_keys", "underscore_keys",
+    "gen_idents", "gen_unique_idents",
 
     "singleton", "ignore_error", "wrap_async_func", "wrap_async_funcs", "async_ignore_error",
+    "iter_async_funcs", "run_in_pool", "RetryBudget", "retry", "async_retry", "timeout", "async_timeout",
+    "CircuitBreaker",
 
-    "pool", "thread_pool", "pool_submit",
+    "pool", "thread_pool", "pool_submit", "Bulkhead",
 
-    "sanic_schema_validate", "flask_schema_validate", "verify_schema", "schema2swagger", "gen_schema", "fields",
+    "RateLimiter", "KeyedRateLimiter",
+
+    "sanic_schema_validate", "flask_schema_validate", "verify_schema", "schema2swagger", "gen_schema",
+    "verify_schema_iter", "compile_schema", "set_schema_error_log", "schema_error_stats",
+    "pregen_schemas", "schema2openapi", "dump_many", "iter_dump_json", "fields",
 
     "execute_shell", "async_execute_shell",
 
     "gmt2time", "ymd2time", "time2gmt", "time2ymd", "iso2time", "time2iso", "stamp2time", "time2stamp",
+    "stamps2time", "times2ymd", "times2iso", "times2stamp", "ymds2time",
+    "CachedTimeFormatter", "cached_time2gmt", "cached_time2ymd",
+    "time_bucket", "time_buckets", "bucket_range", "table_suffixes",
 
     "expand_nested_list", "is_iterable", "chunked", "chunked_iter",
 
+    "json_loads", "set_json_loads", "json_dumps", "set_json_dumps",
+
+    "file_digest", "files_digest",
+
     "__version__",
 )
 
-__version__ = "1.1.1"
+__version__ = "1.2.0"
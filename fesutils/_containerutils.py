@@ -9,6 +9,7 @@
 和容器相关的常用工具方法
 """
 import itertools
+from array import array
 from typing import Any, Callable, List, Tuple, Union
 
 __all__ = ("expand_nested_list", "is_iterable", "chunked", "chunked_iter",)
@@ -84,6 +85,14 @@ def chunked_iter(src, size, **kw):
     [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, None, None]]
 
     Note that ``fill=None`` in fact uses ``None`` as the fill value.
+
+    Sliceable inputs are chunked by slicing instead of element by element:
+    ``str`` and ``bytes`` chunks keep their type, lists, tuples, arrays,
+    ranges, bytearrays and memoryviews still yield lists. Pass ``view=True``
+    to get zero-copy ``memoryview`` chunks of bytes-like inputs.
+
+    >>> [bytes(chk) for chk in chunked_iter(b'abcde', 2, view=True)]
+    [b'ab', b'cd', b'e']
     """
     # TODO: add count kwarg?
     if not is_iterable(src):
@@ -97,6 +106,7 @@ def chunked_iter(src, size, **kw):
     except KeyError:
         do_fill = False
         fill_val = None
+    view = kw.pop('view', False)
     if kw:
         raise ValueError('got unexpected keyword arguments: %r' % kw.keys())
     if not src:
@@ -106,6 +116,9 @@ def chunked_iter(src, size, **kw):
         postprocess = lambda chk, _sep=type(src)(): _sep.join(chk)
         if isinstance(src, bytes):
             postprocess = lambda chk: bytes(chk)
+    if isinstance(src, (str, bytes, list, tuple, bytearray, memoryview, array, range)):
+        yield from _chunked_slices(src, size, do_fill, fill_val, postprocess, view)
+        return
     src_iter = iter(src)
     while True:
         cur_chunk = list(itertools.islice(src_iter, size))
@@ -116,3 +129,42 @@ def chunked_iter(src, size, **kw):
             cur_chunk[lc:] = [fill_val] * (size - lc)
         yield postprocess(cur_chunk)
     return
+
+
+def _chunked_slices(src, size, do_fill, fill_val, postprocess, view):
+    """
+    chunked_iter对可切片对象的处理,直接切片而不是逐个元素复制
+    """
+    if view and isinstance(src, (bytes, bytearray, memoryview)):
+        src = memoryview(src)
+        to_chunk: Callable[[Any], Any] = lambda chk: chk
+        postprocess = lambda chk: memoryview(bytes(chk))
+    elif isinstance(src, (str, bytes, list)):
+        to_chunk = lambda chk: chk
+    else:
+        to_chunk = list
+    length = len(src)
+    for start in range(0, length, size):
+        cur_chunk = src[start:start + size]
+        lc = len(cur_chunk)
+        if lc < size and do_fill:
+            yield postprocess(list(cur_chunk) + [fill_val] * (size - lc))
+        else:
+            yield to_chunk(cur_chunk)
+
+
+if __name__ == '__main__':
+    import time
+
+    _buffer = bytes(64 * 1024 * 1024)
+    _expected = [_buffer[start:start + 65536] for start in range(0, len(_buffer), 65536)]
+    for _name, _func in (("generic", lambda: list(chunked_iter(iter(_buffer[:8 * 1024 * 1024]), 65536))),
+                         ("bytes slices", lambda: list(chunked_iter(_buffer, 65536))),
+                         ("memoryview", lambda: list(chunked_iter(_buffer, 65536, view=True)))):
+        _start = time.perf_counter()
+        _chunks = _func()
+        _elapsed = time.perf_counter() - _start
+        _size = sum(len(chk) for chk in _chunks)
+        print("{:<14} {:>6}MB {:>10.1f}ms {:>10.1f}MB/s".format(
+            _name, _size // 1024 // 1024, _elapsed * 1e3, _size / 1024 / 1024 / _elapsed))
+    assert list(chunked_iter(_buffer, 65536)) == _expected
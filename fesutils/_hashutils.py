@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/18 下午11:30
+
+流式计算摘要的工具类,文件不需要一次性读入内存
+"""
+import hashlib
+import io
+import mmap
+import os
+import threading
+from concurrent.futures import Executor
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Union, cast
+
+from ._poolutils import thread_pool
+
+__all__ = ("file_digest", "files_digest")
+
+# 默认每次读取的字节数
+DIGEST_BUFFER_SIZE = 1024 * 1024
+# 每个线程复用的读取缓冲区
+_local = threading.local()
+
+_ALGORITHM_ALIASES = {"blake2": "blake2b"}
+
+
+def _new_hash(algorithm: str):
+    """
+    生成摘要对象,支持hashlib中的所有算法,blake2等同于blake2b
+    """
+    return hashlib.new(_ALGORITHM_ALIASES.get(algorithm, algorithm))
+
+
+def _get_buffer(buffer_size: int) -> memoryview:
+    """
+    获取当前线程复用的缓冲区
+    """
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or len(buffer) != buffer_size:
+        buffer = _local.buffer = memoryview(bytearray(buffer_size))
+    return buffer
+
+
+def _update_file(hash_obj, file_obj: BinaryIO, buffer_size: int):
+    """
+    读取文件对象更新摘要,支持readinto的使用复用的缓冲区,否则使用read
+    """
+    if hasattr(file_obj, "readinto"):
+        buffer = _get_buffer(buffer_size)
+        readinto = file_obj.readinto
+        while True:
+            size = readinto(buffer)
+            if not size:
+                break
+            hash_obj.update(buffer[:size])
+    else:
+        while True:
+            chunk = file_obj.read(buffer_size)
+            if not chunk:
+                break
+            hash_obj.update(chunk.encode() if isinstance(chunk, str) else chunk)
+
+
+def _update_path(hash_obj, path: Union[str, os.PathLike], buffer_size: int, use_mmap: bool):
+    """
+    读取本地文件更新摘要
+    """
+    with open(path, "rb", buffering=0) as file_obj:
+        if use_mmap:
+            try:
+                with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    hash_obj.update(mm)
+                return
+            except ValueError:  # 空文件不能mmap
+                pass
+        _update_file(hash_obj, file_obj, buffer_size)
+
+
+def file_digest(src: Union[bytes, bytearray, memoryview, str, os.PathLike, BinaryIO, Iterable[Any]],
+                algorithm: str = "md5", buffer_size: int = DIGEST_BUFFER_SIZE, use_mmap: bool = False) -> str:
+    """
+    流式计算摘要,文件按照buffer_size分块读取,不需要一次性读入内存
+    eg:
+        file_digest("/data/export.csv", "sha256")
+        file_digest(request.files["file"][0].body)
+        file_digest(iter_dump_json(UserSchema, users), "blake2")
+    Args:
+        src: bytes等二进制数据、本地文件路径、二进制文件对象或者数据块的可迭代对象,str类型的数据块使用utf-8编码
+        algorithm: 摘要算法, md5,sha1,sha256,blake2b,blake2s等hashlib支持的算法, blake2等同于blake2b
+        buffer_size: 每次读取的字节数
+        use_mmap: 本地文件是否使用mmap映射后计算,大文件时可以减少拷贝
+    Returns:
+        十六进制的摘要
+    """
+    hash_obj = _new_hash(algorithm)
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        hash_obj.update(src)
+    elif isinstance(src, (str, os.PathLike)):
+        _update_path(hash_obj, src, buffer_size, use_mmap)
+    elif isinstance(src, io.IOBase) or hasattr(src, "read"):
+        _update_file(hash_obj, cast(BinaryIO, src), buffer_size)
+    else:
+        for chunk in src:
+            hash_obj.update(chunk.encode() if isinstance(chunk, str) else chunk)
+    return hash_obj.hexdigest()
+
+
+def files_digest(paths: Iterable[Union[str, os.PathLike]], algorithm: str = "md5",
+                 buffer_size: int = DIGEST_BUFFER_SIZE, use_mmap: bool = False,
+                 executor: Optional[Executor] = None) -> Dict[Union[str, os.PathLike], str]:
+    """
+    在线程池中并发计算多个本地文件的摘要,hashlib计算时会释放GIL
+    Args:
+        paths: 本地文件路径
+        algorithm: 摘要算法,同file_digest
+        buffer_size: 每次读取的字节数
+        use_mmap: 是否使用mmap映射后计算
+        executor: 执行计算的线程池,默认为thread_pool
+    Returns:
+        {文件路径: 十六进制的摘要}, 顺序和paths一致
+    """
+    executor = thread_pool if executor is None else executor
+    futures = {path: executor.submit(file_digest, path, algorithm, buffer_size, use_mmap) for path in paths}
+    return {path: future.result() for path, future in futures.items()}
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as _tmp_dir:
+        _paths = []
+        for _index in range(8):
+            _path = os.path.join(_tmp_dir, "file{}.bin".format(_index))
+            with open(_path, "wb") as _file:
+                _file.write(os.urandom(32 * 1024 * 1024))
+            _paths.append(_path)
+
+        def _read_all(path):
+            with open(path, "rb") as file_obj:
+                return hashlib.sha256(file_obj.read()).hexdigest()
+
+        _expected = {path: _read_all(path) for path in _paths}
+        for _name, _func in (
+                ("read all", lambda: {path: _read_all(path) for path in _paths}),
+                ("file_digest", lambda: {path: file_digest(path, "sha256") for path in _paths}),
+                ("file_digest mmap", lambda: {path: file_digest(path, "sha256", use_mmap=True) for path in _paths}),
+                ("files_digest", lambda: files_digest(_paths, "sha256"))):
+            _start = time.perf_counter()
+            assert _func() == _expected
+            print("{:<18} {:>8.1f}ms".format(_name, (time.perf_counter() - _start) * 1e3))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/18 下午4:05
+
+json解析和序列化工具类,安装了orjson或者ujson时优先使用,否则使用标准库json
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+__all__ = ("json_loads", "set_json_loads", "json_dumps", "set_json_dumps")
+
+
+def _default_loads() -> Callable[[Union[str, bytes]], Any]:
+    """
+    按照orjson, ujson, json的顺序选择可用的解析函数
+    """
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        return orjson.loads
+    try:
+        import ujson  # type: ignore
+    except ImportError:
+        pass
+    else:
+        return ujson.loads
+    return json.loads
+
+
+def _default_dumps() -> Callable[[Any], bytes]:
+    """
+    按照orjson, ujson, json的顺序选择可用的序列化函数,统一返回utf-8编码的bytes
+    """
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        return orjson.dumps
+    try:
+        import ujson  # type: ignore
+    except ImportError:
+        pass
+    else:
+        return lambda obj: ujson.dumps(obj, ensure_ascii=False).encode()
+    return lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+_json_loads = _default_loads()
+_json_dumps = _default_dumps()
+
+
+def set_json_loads(loads: Optional[Callable[[Union[str, bytes]], Any]] = None):
+    """
+    设置json解析函数,解析失败时需要抛出ValueError或者其子类
+    Args:
+        loads: json解析函数,需要支持str和bytes,为None时恢复默认的解析函数
+    Returns:
+
+    """
+    global _json_loads
+    _json_loads = _default_loads() if loads is None else loads
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    解析json字符串
+    Args:
+        data: json字符串或者bytes
+    Returns:
+        解析后的对象
+    """
+    return _json_loads(data)
+
+
+def set_json_dumps(dumps: Optional[Callable[[Any], bytes]] = None):
+    """
+    设置json序列化函数
+    Args:
+        dumps: json序列化函数,需要返回utf-8编码的bytes,为None时恢复默认的序列化函数
+    Returns:
+
+    """
+    global _json_dumps
+    _json_dumps = _default_dumps() if dumps is None else dumps
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    序列化为json
+    Args:
+        obj: 要序列化的对象
+    Returns:
+        utf-8编码的json bytes
+    """
+    return _json_dumps(obj)
+
+
+if __name__ == '__main__':
+    import timeit
+
+    from marshmallow import Schema
+
+    from .schemautils import fields, verify_schema
+
+    class _ItemSchema(Schema):
+        sku = fields.String(required=True)
+        count = fields.Integer(required=True)
+        price = fields.Float()
+
+    class _OrderSchema(Schema):
+        order_id = fields.String(required=True)
+        user_id = fields.Integer(required=True)
+        remark = fields.String()
+        paid = fields.Boolean()
+        items = fields.List(fields.Nested(_ItemSchema))
+
+    _body = json.dumps({"order_id": "o-20201012", "user_id": 10086, "remark": "备注" * 20, "paid": True,
+                        "items": [{"sku": "sku-{}".format(i), "count": i, "price": i * 1.5}
+                                  for i in range(50)]}).encode()
+    _decoders = [("json", json.loads)]
+    for _name in ("ujson", "orjson"):
+        try:
+            _decoders.append((_name, __import__(_name).loads))
+        except ImportError:
+            pass
+    print("payload {} bytes".format(len(_body)))
+    for _name, _loads in _decoders:
+        _number = 2000
+        _decode = min(timeit.repeat(lambda: _loads(_body), number=_number, repeat=3))
+        _total = min(timeit.repeat(lambda: verify_schema(_OrderSchema, _loads(_body)), number=_number, repeat=3))
+        print("{:<8} decode {:>8.1f}us  decode+validate {:>8.1f}us".format(
+            _name, _decode / _number * 1e6, _total / _number * 1e6))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/18 上午10:12
+
+限流工具类,同步和异步代码共用
+"""
+import asyncio
+import inspect
+import threading
+import time
+from functools import wraps
+from typing import Callable, Hashable, Optional
+
+from .cacheutils import LRU
+from .err import FuncArgsError
+
+__all__ = ("RateLimiter", "KeyedRateLimiter")
+
+
+def _verify_rate_args(rate: float, capacity: int):
+    """
+    校验限流参数,参数错误时抛出FuncArgsError
+    """
+    if rate <= 0:
+        raise FuncArgsError("rate must be positive, rate={}".format(rate))
+    if capacity < 1:
+        raise FuncArgsError("capacity must be a positive integer, capacity={}".format(capacity))
+
+
+class RateLimiter(object):
+    """
+    令牌桶限流器
+
+    使用GCRA(通用信元速率算法)实现,和容量为capacity的令牌桶等价,capacity为1时即为漏桶。
+    每次获取只在锁内计算一次可以执行的时间点并预约,然后在锁外等待,所以竞争时获取是O(1)的,
+    并且按照预约的先后顺序执行,先到先得。同一个限流器可以同时被线程和协程使用。
+    eg:
+        limiter = RateLimiter(100, capacity=10)
+        with limiter:
+            ...
+        async with limiter:
+            ...
+
+        @limiter
+        async def call_api(): ...
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+            令牌桶限流器
+        Args:
+            rate: 每秒产生的令牌数
+            capacity: 令牌桶容量,即允许的突发请求数
+        """
+        _verify_rate_args(rate, capacity)
+        self.rate = rate
+        self.capacity = capacity
+        self._interval = 1.0 / rate
+        self._tolerance = capacity * self._interval
+        self._tat = 0.0  # 理论到达时间,令牌桶为空的时间点
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 1, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        预约令牌
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最多等待的时间,单位秒,None表示一直等待
+        Returns:
+            需要等待的秒数,等待时间超过timeout时不预约并返回None
+        """
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now) + tokens * self._interval
+            wait = max(tat - self._tolerance - now, 0.0)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tat = tat
+            return wait
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """
+        不等待的获取令牌
+        Args:
+            tokens: 需要的令牌数
+        Returns:
+            获取失败返回False
+        """
+        return self.reserve(tokens, 0) is not None
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        获取令牌,令牌不足时阻塞等待
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最多等待的时间,单位秒,None表示一直等待
+        Returns:
+            获取失败返回False
+        """
+        wait = self.reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def async_acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        异步获取令牌,令牌不足时等待,不阻塞事件循环
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最多等待的时间,单位秒,None表示一直等待
+        Returns:
+            获取失败返回False
+        """
+        wait = self.reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aenter__(self):
+        await self.async_acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        装饰器形式,支持同步和异步函数
+        """
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                await self.async_acquire()
+                return await func(*args, **kwargs)
+
+            return _async_wrapper
+
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            self.acquire()
+            return func(*args, **kwargs)
+
+        return _wrapper
+
+    def __repr__(self):
+        return "<{} rate={} capacity={}>".format(self.__class__.__name__, self.rate, self.capacity)
+
+
+class KeyedRateLimiter(object):
+    """
+    按key限流,每个key一个令牌桶,令牌桶保存在LRU中,最久没有使用的key会被淘汰
+    eg:
+        limiter = KeyedRateLimiter(10, capacity=5)
+        async with limiter[tenant_id]:
+            ...
+    """
+
+    def __init__(self, rate: float, capacity: int = 1, max_keys: int = 10000):
+        """
+            按key限流
+        Args:
+            rate: 每个key每秒产生的令牌数
+            capacity: 每个key的令牌桶容量
+            max_keys: 最多保存的key的数量
+        """
+        _verify_rate_args(rate, capacity)
+        self.rate = rate
+        self.capacity = capacity
+        self._limiters = LRU(max_size=max_keys, on_miss=lambda _: RateLimiter(rate, capacity))
+
+    def __getitem__(self, key: Hashable) -> RateLimiter:
+        return self._limiters[key]
+
+    def __len__(self):
+        return len(self._limiters)
+
+    def try_acquire(self, key: Hashable, tokens: int = 1) -> bool:
+        """
+        不等待的获取key对应的令牌
+        """
+        return self._limiters[key].try_acquire(tokens)
+
+    def acquire(self, key: Hashable, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        获取key对应的令牌,令牌不足时阻塞等待
+        """
+        return self._limiters[key].acquire(tokens, timeout)
+
+    async def async_acquire(self, key: Hashable, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        异步获取key对应的令牌,令牌不足时等待
+        """
+        return await self._limiters[key].async_acquire(tokens, timeout)
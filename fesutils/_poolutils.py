@@ -6,23 +6,230 @@
 @software: PyCharm
 @time: 18-12-26 下午3:32
 """
+import asyncio
+import inspect
 import multiprocessing
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+from typing import Callable, Deque, Dict, Optional, Tuple
 
 import aelog
 
-__all__ = ("pool", "thread_pool", "pool_submit",)
+from .err import BulkheadFullError, FuncArgsError
+
+__all__ = ("pool", "thread_pool", "pool_submit", "Bulkhead")
 
 # 执行任务的线程池
 pool = thread_pool = ThreadPoolExecutor(multiprocessing.cpu_count() * 10 + multiprocessing.cpu_count())
 
 
-def pool_submit(func: Callable, *args, task_name: str = "", **kwargs):
+class Bulkhead(object):
+    """
+    隔离舱,限制同一个资源占用的并发数
+
+    某个下游变慢时,调用它的任务最多占用max_concurrent个线程,其余的调用直接拒绝或者等待max_wait秒,
+    这样不会因为一个慢的下游把共享的线程池全部占满;异步等待的调用按照先后顺序获取释放的名额
+    eg:
+        order_bulkhead = Bulkhead("order", 10)
+        order_bulkhead.submit(func, *args, **kwargs)
+
+        @order_bulkhead
+        async def query_order(): ...
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float = 0):
+        """
+            隔离舱
+        Args:
+            name: 资源名称
+            max_concurrent: 最大并发数
+            max_wait: 并发数已满时最多等待的时间,单位秒,默认不等待直接拒绝
+        """
+        if max_concurrent <= 0:
+            raise FuncArgsError("max_concurrent must be a positive integer, max_concurrent={}".format(max_concurrent))
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        # 异步等待名额的协程,释放名额时直接交给最早等待的协程
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._active = 0
+        self._max_active = 0
+        self._accepted = 0
+        self._rejected = 0
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """
+        隔离舱的统计数据
+        """
+        with self._lock:
+            return {"active": self._active, "max_active": self._max_active,
+                    "accepted": self._accepted, "rejected": self._rejected}
+
+    def _acquired(self, acquired: bool) -> bool:
+        """
+        记录获取结果
+        """
+        with self._lock:
+            if acquired:
+                self._active += 1
+                self._accepted += 1
+                self._max_active = max(self._max_active, self._active)
+            else:
+                self._rejected += 1
+        return acquired
+
+    def acquire(self) -> bool:
+        """
+        获取一个并发名额,最多等待max_wait秒
+        Returns:
+            获取失败返回False
+        """
+        if self.max_wait > 0:
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        return self._acquired(acquired)
+
+    async def async_acquire(self) -> bool:
+        """
+        异步获取一个并发名额,最多等待max_wait秒,等待期间不会阻塞事件循环
+        Returns:
+            获取失败返回False
+        """
+        loop = asyncio.get_event_loop()
+        with self._lock:
+            # 有协程在等待时排在后面,不能插队
+            acquired = not self._waiters and self._semaphore.acquire(blocking=False)
+            if acquired or self.max_wait <= 0:
+                waiter = None
+            else:
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+        if waiter is None:
+            return self._acquired(acquired)
+
+        try:
+            await asyncio.wait_for(waiter[1], self.max_wait)
+        except asyncio.TimeoutError:
+            # 超时的同时可能已经被分配了名额
+            acquired = not self._remove_waiter(waiter)
+        except BaseException:
+            if not self._remove_waiter(waiter):
+                self._release_slot()
+            raise
+        else:
+            acquired = True
+        return self._acquired(acquired)
+
+    def _remove_waiter(self, waiter: Tuple[asyncio.AbstractEventLoop, asyncio.Future]) -> bool:
+        """
+        从等待队列中移除
+        Returns:
+            已经被分配了名额时返回False
+        """
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    @staticmethod
+    def _wake_waiter(future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+
+    def _release_slot(self):
+        """
+        释放名额,有协程在等待时直接交给最早等待的协程
+        """
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._wake_waiter, future)
+                except RuntimeError:  # 事件循环已经关闭
+                    continue
+                return
+        self._semaphore.release()
+
+    def release(self):
+        """
+        释放一个并发名额
+        """
+        with self._lock:
+            self._active -= 1
+        self._release_slot()
+
+    def _full_error(self) -> BulkheadFullError:
+        return BulkheadFullError("Bulkhead {} is full, max_concurrent={}".format(self.name, self.max_concurrent))
+
+    def __enter__(self):
+        if not self.acquire():
+            raise self._full_error()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    async def __aenter__(self):
+        if not await self.async_acquire():
+            raise self._full_error()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        在隔离舱的并发数限制内提交任务到线程池,任务完成后释放名额
+        Args:
+            func, *args, **kwargs
+        Returns:
+            concurrent.futures.Future
+        """
+        if not self.acquire():
+            raise self._full_error()
+        try:
+            future = thread_pool.submit(func, *args, **kwargs)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        装饰器形式,支持同步和异步函数
+        """
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                async with self:
+                    return await func(*args, **kwargs)
+
+            return _async_wrapper
+
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return _wrapper
+
+
+def pool_submit(func: Callable, *args, task_name: str = "", bulkhead: Optional[Bulkhead] = None, **kwargs):
     """
     执行长时间任务的线程调度方法
     Args:
         func, *args, **kwargs
+        task_name: 任务名称
+        bulkhead: 隔离舱,指定后任务的并发数受隔离舱限制,并发数已满时抛出BulkheadFullError
     Returns:
 
     """
@@ -42,5 +249,8 @@ def pool_submit(func: Callable, *args, task_name: str = "", **kwargs):
         else:
             aelog.info("{} return result: {}".format(task_name, data))
 
-    future_result = thread_pool.submit(func, *args, **kwargs)
+    if bulkhead is None:
+        future_result = thread_pool.submit(func, *args, **kwargs)
+    else:
+        future_result = bulkhead.submit(func, *args, **kwargs)
     future_result.add_done_callback(callback_done)
@@ -7,16 +7,25 @@
 @time: 2020/3/2 下午6:36
 """
 import hashlib
+import os
 import re
 import secrets
 import string
 import uuid
+from array import array
 from decimal import Decimal
-from typing import Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-__all__ = ("gen_ident", "gen_unique_ident", "camel2under", "under2camel", "number", "str2md5")
+from .cacheutils import LRU
+from .err import FuncArgsError, NumberValueError
+
+__all__ = ("gen_ident", "gen_unique_ident", "camel2under", "under2camel", "number", "numbers", "str2md5",
+           "cached_camel2under", "cached_under2camel", "camelize_keys", "underscore_keys",
+           "gen_idents", "gen_unique_idents")
 
 _camel2under_re = re.compile('((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))')
+# 缓存转换结果的数量,字段名的数量是有限的
+CASE_CACHE_SIZE = 4096
 
 
 def gen_ident(ident_len: int = 8):
@@ -44,6 +53,79 @@ def gen_unique_ident():
     return f"{secrets.choice(string.ascii_lowercase)}{uuid.uuid4().hex}"
 
 
+def _gen_translate(alphabet: str) -> bytes:
+    """
+    生成把随机字节映射到字母表的转换表,字节值按照字母表长度取余
+    """
+    return bytes(ord(alphabet[val % len(alphabet)]) for val in range(256))
+
+
+_IDENT_ALPHABET = f"{string.ascii_lowercase}{string.digits}"
+_IDENT_TABLE = _gen_translate(_IDENT_ALPHABET)
+_FIRST_TABLE = _gen_translate(string.ascii_lowercase)
+# 拒绝采样,只保留小于字母表长度整数倍的字节,保证每个字符的概率相同
+_IDENT_REJECT = bytes(range(256 // len(_IDENT_ALPHABET) * len(_IDENT_ALPHABET), 256))
+_FIRST_REJECT = bytes(range(256 // len(string.ascii_lowercase) * len(string.ascii_lowercase), 256))
+# 设置uuid4的版本号和变体位
+_UUID_VERSION_TABLE = bytes(val & 0x0f | 0x40 for val in range(256))
+_UUID_VARIANT_TABLE = bytes(val & 0x3f | 0x80 for val in range(256))
+
+
+def _random_chars(count: int, table: bytes, reject: bytes) -> str:
+    """
+    一次读取大块的随机字节,通过拒绝采样和转换表生成count个随机字符
+    """
+    chars = b""
+    while len(chars) < count:
+        need = count - len(chars)
+        # 多读取一些字节补偿被拒绝的字节
+        chars += os.urandom(need + need // 8 + 16).translate(table, reject)
+    return chars[:count].decode("ascii")
+
+
+def gen_idents(count: int, ident_len: int = 8, unique: bool = True) -> List[str]:
+    """
+    批量获取随机的标识码以字母开头,和gen_ident的字符分布一致
+
+    一次从os.urandom读取所有需要的随机字节,不需要每个字符调用一次secrets.choice
+    Args:
+        count: 标识码的数量
+        ident_len: 标识码的长度,默认8个字符
+        unique: 是否保证返回的标识码不重复
+    Returns:
+        标识码列表
+    """
+    if unique and count > len(string.ascii_lowercase) * len(_IDENT_ALPHABET) ** (ident_len - 1):
+        raise ValueError("count is larger than the number of possible idents, count={}".format(count))
+    idents: Dict[str, None] = {}
+    while len(idents) < count:
+        need = count - len(idents) if unique else count
+        firsts = _random_chars(need, _FIRST_TABLE, _FIRST_REJECT)
+        rest_len = ident_len - 1
+        rests = _random_chars(need * rest_len, _IDENT_TABLE, _IDENT_REJECT)
+        new_idents = [firsts[index] + rests[index * rest_len:(index + 1) * rest_len] for index in range(need)]
+        if not unique:
+            return new_idents
+        idents.update(dict.fromkeys(new_idents))
+    return list(idents)
+
+
+def gen_unique_idents(count: int) -> List[str]:
+    """
+    批量获取以字母开头的唯一字符串,和gen_unique_ident的格式一致
+    Args:
+        count: 数量
+    Returns:
+
+    """
+    firsts = _random_chars(count, _FIRST_TABLE, _FIRST_REJECT)
+    randoms = bytearray(os.urandom(count * 16))
+    randoms[6::16] = randoms[6::16].translate(_UUID_VERSION_TABLE)
+    randoms[8::16] = randoms[8::16].translate(_UUID_VARIANT_TABLE)
+    hex_randoms = randoms.hex()
+    return [firsts[index] + hex_randoms[index * 32:(index + 1) * 32] for index in range(count)]
+
+
 def camel2under(camel_string):
     """Converts a camelcased string to underscores. Useful for turning a
     class name into a function name.
@@ -64,6 +146,105 @@ def under2camel(under_string):
     return ''.join(w.capitalize() or '_' for w in under_string.split('_'))
 
 
+def _under2lower_camel(under_string):
+    """
+    转换为首字母小写的驼峰, eg: user_id -> userId
+    """
+    camel_string = under2camel(under_string)
+    return camel_string[:1].lower() + camel_string[1:]
+
+
+_camel2under_cache = LRU(max_size=CASE_CACHE_SIZE, on_miss=camel2under)
+_under2camel_cache = LRU(max_size=CASE_CACHE_SIZE, on_miss=under2camel)
+_under2lower_camel_cache = LRU(max_size=CASE_CACHE_SIZE, on_miss=_under2lower_camel)
+
+
+def cached_camel2under(camel_string):
+    """
+    和camel2under一致,转换结果缓存在LRU中
+
+    >>> cached_camel2under('BasicParseTest')
+    'basic_parse_test'
+    """
+    return _camel2under_cache[camel_string]
+
+
+def cached_under2camel(under_string):
+    """
+    和under2camel一致,转换结果缓存在LRU中
+
+    >>> cached_under2camel('complex_tokenizer')
+    'ComplexTokenizer'
+    """
+    return _under2camel_cache[under_string]
+
+
+def _transform_keys(data: Any, cache: LRU) -> Any:
+    """
+    转换嵌套的字典和列表中所有字典的key,使用栈迭代处理,不递归调用
+    Args:
+        data: 字典或者列表,其他类型的值原样返回
+        cache: 缓存key转换结果的LRU
+    Returns:
+        转换后新的字典或者列表
+    """
+    if not isinstance(data, (dict, list)):
+        return data
+    keys: Dict[Any, Any] = {}  # 本次转换的key,同一个key只查询一次LRU
+    root: Union[dict, list] = {} if isinstance(data, dict) else []
+    stack: List[Tuple[Any, Any]] = [(data, root)]
+    while stack:
+        src, dst = stack.pop()
+        is_dict = isinstance(src, dict)
+        for key, val in (src.items() if is_dict else enumerate(src)):
+            new_val: Any
+            if isinstance(val, dict):
+                new_val = {}
+                stack.append((val, new_val))
+            elif isinstance(val, list):
+                new_val = []
+                stack.append((val, new_val))
+            else:
+                new_val = val
+            if is_dict:
+                new_key = keys.get(key)
+                if new_key is None:
+                    new_key = keys[key] = cache[key] if isinstance(key, str) else key
+                dst[new_key] = new_val
+            else:
+                dst.append(new_val)
+    return root
+
+
+def camelize_keys(data: Any, lower: bool = True) -> Any:
+    """
+    把嵌套的字典和列表中所有字典的key从下划线转换为驼峰,主要用于数据库字段转换为接口字段
+
+    >>> camelize_keys({'user_id': 1, 'order_items': [{'sku_id': 2}]})
+    {'userId': 1, 'orderItems': [{'skuId': 2}]}
+    Args:
+        data: 字典或者列表
+        lower: 是否首字母小写, 为False时和under2camel一致
+    Returns:
+        转换后新的字典或者列表
+    """
+    return _transform_keys(data, _under2lower_camel_cache if lower else _under2camel_cache)
+
+
+def underscore_keys(data: Any) -> Any:
+    """
+    把嵌套的字典和列表中所有字典的key从驼峰转换为下划线,主要用于接口字段转换为数据库字段
+
+    >>> underscore_keys({'userId': 1, 'orderItems': [{'skuId': 2}]})
+    {'user_id': 1, 'order_items': [{'sku_id': 2}]}
+    Args:
+        data: 字典或者列表
+    Returns:
+        转换后新的字典或者列表
+    """
+    return _transform_keys(data, _camel2under_cache)
+
+
 def number(str_value: str, default: Union[int, float, Decimal] = 0) -> Union[int, float, Decimal]:
     """
     把字符串值转换为int或者float
@@ -96,6 +277,75 @@ def number(str_value: str, default: Union[int, float, Decimal] = 0) -> Union[int
         return default
 
 
+_INVALID = object()
+
+
+def _parse_number(str_value: str) -> Union[int, float, object]:
+    """
+    和number一样的规则把字符串转换为int或者float,无效的值返回_INVALID
+    """
+    if str_value.isdecimal():
+        return int(str_value)
+    body = str_value[1:] if str_value.startswith(("-", "+")) else str_value
+    try:
+        if body.isdecimal():
+            return int(str_value)
+        elif body.replace(".", "").isdecimal():
+            return float(str_value)
+    except ValueError:  # 有多个小数点
+        pass
+    return _INVALID
+
+
+def numbers(values: Iterable[Any], default: Union[int, float, Decimal] = 0, typecode: Optional[str] = None,
+            use_numpy: bool = False, strict: bool = False) -> Union[List[Union[int, float, Decimal]], array, Any]:
+    """
+    批量把字符串值转换为int或者float,规则和number一致,主要用于CSV、表单等整列数据的转换
+
+    同样的字符串只转换一次
+    Args:
+        values: 需要转换的值
+        default: 转换失败的默认值,默认值只能为Number类型,默认为0
+        typecode: 返回array的类型, q: array('q'), 小数会被截断, d: array('d'), 默认返回列表,其他值抛出FuncArgsError
+        use_numpy: 是否返回numpy数组,typecode为q或者d时分别为int64和float64
+        strict: 为True时有无效值抛出NumberValueError,indices为所有无效值的索引,否则使用默认值
+    Returns:
+
+    """
+    if typecode not in (None, "q", "d"):
+        raise FuncArgsError("typecode must be None, 'q' or 'd', typecode={!r}".format(typecode))
+    default = default if isinstance(default, (int, float, Decimal)) else 0
+    parsed: Dict[str, Any] = {}
+    result: List[Any] = []
+    append = result.append
+    invalid_indices: List[int] = []
+    for index, val in enumerate(values):
+        if isinstance(val, str):
+            number_value = parsed.get(val)
+            if number_value is None:
+                number_value = parsed[val] = _parse_number(val)
+        elif isinstance(val, (int, float, Decimal)):
+            number_value = val
+        else:
+            number_value = _INVALID
+        if number_value is _INVALID:
+            number_value = default
+            if strict:
+                invalid_indices.append(index)
+        append(number_value)
+    if invalid_indices:
+        raise NumberValueError("invalid number values, count={}".format(len(invalid_indices)), invalid_indices)
+
+    if use_numpy:
+        import numpy as np
+        return np.array(result, dtype=None if typecode is None else {"q": np.int64, "d": np.float64}[typecode])
+    if typecode == "q":
+        return array("q", [int(val) for val in result])
+    elif typecode == "d":
+        return array("d", result)
+    return result
+
+
 def str2md5(content: str):
     """
     获取内容的MD5值
@@ -107,3 +357,52 @@ def str2md5(content: str):
     h = hashlib.md5()
     h.update(content.encode())
     return h.hexdigest()
+
+
+if __name__ == '__main__':
+    import random
+    import timeit
+
+    _values = [random.choice(("{}".format(random.randint(-500, 500)), "{:.2f}".format(random.random() * 100),
+                              "", "N/A", "+7", "3.5.1")) for _ in range(100000)]
+    # number转换有多个小数点的值时会抛出ValueError
+    _valid = [val for val in _values if val != "3.5.1"]
+    assert numbers(_valid) == [number(val) for val in _valid]
+    try:
+        numbers(_values, strict=True)
+    except NumberValueError as e:
+        print(e.message, e.indices[:5])
+
+    _codes = gen_idents(100000, 6)
+    assert len(set(_codes)) == 100000 and all(code[0] in string.ascii_lowercase and len(code) == 6 for code in _codes)
+    for _name, _func in (("gen_ident", lambda: [gen_ident() for _ in range(100000)]),
+                         ("gen_idents", lambda: gen_idents(100000)),
+                         ("gen_unique_ident", lambda: [gen_unique_ident() for _ in range(100000)]),
+                         ("gen_unique_idents", lambda: gen_unique_idents(100000))):
+        _elapsed = min(timeit.repeat(_func, number=1, repeat=3))
+        print("{:<18} {:>8.1f}ms".format(_name, _elapsed * 1e3))
+
+    _records = [{"userId": i, "userName": "name", "createTime": 0, "orderItems": [
+        {"skuId": j, "unitPrice": 1.5, "itemCount": 2} for j in range(3)]} for i in range(10000)]
+    assert underscore_keys(_records) == [{camel2under(key): [{camel2under(k): v for k, v in item.items()}
+                                                             for item in val] if isinstance(val, list) else val
+                                          for key, val in record.items()} for record in _records]
+    assert camelize_keys(underscore_keys(_records)) == _records
+
+    def _underscore(data):
+        if isinstance(data, dict):
+            return {camel2under(key): _underscore(val) for key, val in data.items()}
+        elif isinstance(data, list):
+            return [_underscore(val) for val in data]
+        return data
+
+    for _name, _func in (("recursive camel2under", lambda: _underscore(_records)),
+                         ("underscore_keys", lambda: underscore_keys(_records))):
+        _elapsed = min(timeit.repeat(_func, number=1, repeat=3))
+        print("{:<22} {:>8.1f}ms".format(_name, _elapsed * 1e3))
+
+    for _name, _convert in (("number", lambda: [number(val) for val in _valid]),
+                            ("numbers", lambda: numbers(_valid)),
+                            ("numbers array", lambda: numbers(_valid, typecode="d"))):
+        _elapsed = min(timeit.repeat(_convert, number=1, repeat=3))
+        print("{:<14} {:>8.1f}ms".format(_name, _elapsed * 1e3))
@@ -6,25 +6,144 @@
 @software: PyCharm
 @time: 2020/3/9 下午8:00
 """
+import asyncio
 import sys
-from datetime import datetime
-from time import localtime, mktime
-from typing import Union
+from array import array
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from time import localtime, mktime, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union, cast
 
 from marshmallow.utils import from_iso_datetime
 
-__all__ = ("gmt2time", "ymd2time", "time2gmt", "time2ymd", "iso2time", "time2iso", "stamp2time", "time2stamp")
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # python3.9之前需要安装backports.zoneinfo
+    try:
+        from backports.zoneinfo import ZoneInfo  # type: ignore
+    except ImportError:
+        ZoneInfo = None  # type: ignore
 
+__all__ = ("gmt2time", "ymd2time", "time2gmt", "time2ymd", "iso2time", "time2iso", "stamp2time", "time2stamp",
+           "stamps2time", "times2ymd", "times2iso", "times2stamp", "ymds2time",
+           "CachedTimeFormatter", "cached_time2gmt", "cached_time2ymd",
+           "time_bucket", "time_buckets", "bucket_range", "table_suffixes")
+
+_SECONDS = tuple("%02d" % val for val in range(60))
+_CLOCK_MINUTES = tuple("%02d:%02d:" % divmod(val, 60) for val in range(1440))
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_WEEKDAYS = frozenset(('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'))
+_MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+# cached=True时缓存解析结果的数量,日志中同一秒的时间字符串会大量重复
+PARSE_CACHE_SIZE = 4096
+# 每个时区最多缓存UTC偏移的小时数,超过后清空重新缓存
+ZONE_CACHE_SIZE = 100000
+
+
+class _ZoneOffsets(object):
+    """
+    缓存时区每个小时的UTC偏移
+
+    一个小时的开始和结束偏移相同时,这个小时内的时间戳直接加上缓存的偏移得到本地时间,再用整数运算格式化,
+    不需要查询时区数据库,也不需要生成datetime;偏移有变化的小时逐个查询。
+    """
+
+    def __init__(self, zone: tzinfo):
+        self.zone = zone
+        self._offsets: Dict[int, Optional[int]] = {}
+        self._days: Dict[int, Tuple[str, str]] = {}
+
+    def _utcoffset(self, second: int) -> int:
+        utcoffset = datetime.fromtimestamp(second, self.zone).utcoffset()
+        return int(utcoffset.total_seconds()) if utcoffset is not None else 0
+
+    def offset(self, second: int) -> int:
+        """
+        时间戳的UTC偏移秒数
+        """
+        hour = second // 3600
+        try:
+            offset = self._offsets[hour]
+        except KeyError:
+            if len(self._offsets) >= ZONE_CACHE_SIZE:
+                self._offsets.clear()
+                self._days.clear()
+            offset = self._utcoffset(hour * 3600)
+            if offset != self._utcoffset(hour * 3600 + 3599):
+                offset = None
+            self._offsets[hour] = offset
+        return self._utcoffset(second) if offset is None else offset
+
+    def format(self, second: int, iso: bool = False) -> str:
+        """
+        格式化为这个时区的时间
+        Args:
+            second: 整数秒的时间戳
+            iso: 是否为带偏移的iso格式
+        Returns:
+            eg: 2020-03-12 11:21:04, iso为True时eg: 2020-03-12T11:21:04+08:00
+        """
+        offset = self.offset(second)
+        days, clock = divmod(second + offset, 86400)
+        day = self._days.get(days)
+        if day is None:
+            date_val = date.fromordinal(_EPOCH_ORDINAL + days)
+            day = self._days[days] = ("%d-%02d-%02d " % (date_val.year, date_val.month, date_val.day),
+                                      "%04d-%02d-%02dT" % (date_val.year, date_val.month, date_val.day))
+        if iso:
+            return day[1] + _CLOCK_MINUTES[clock // 60] + _SECONDS[clock % 60] + _offset_suffix(offset)
+        return day[0] + _CLOCK_MINUTES[clock // 60] + _SECONDS[clock % 60]
+
+
+_zone_offsets: Dict[Any, _ZoneOffsets] = {}
+_offset_suffixes: Dict[int, str] = {}
+
+
+def _offset_suffix(offset: int) -> str:
+    """
+    偏移秒数对应的iso格式的偏移, eg: +08:00
+    """
+    suffix = _offset_suffixes.get(offset)
+    if suffix is None:
+        suffix = _offset_suffixes[offset] = datetime(
+            2000, 1, 1, tzinfo=timezone(timedelta(seconds=offset))).isoformat()[19:]
+    return suffix
+
+
+def _get_zone(tz: Union[str, tzinfo]) -> _ZoneOffsets:
+    """
+    获取时区的偏移缓存
+    Args:
+        tz: 时区名称或者tzinfo, eg: Asia/Shanghai
+    Returns:
 
-def time2gmt(dt_val: Union[datetime, int, float, None] = None, delim=' ') -> str:
+    """
+    zone_offsets = _zone_offsets.get(tz)
+    if zone_offsets is None:
+        zone: tzinfo
+        if isinstance(tz, str):
+            if ZoneInfo is None:
+                raise ImportError("tz参数需要zoneinfo, python3.9之前请安装backports.zoneinfo")
+            zone = ZoneInfo(tz)
+        else:
+            zone = tz
+        zone_offsets = _zone_offsets.setdefault(tz, _ZoneOffsets(zone))
+    return zone_offsets
+
+
+def time2gmt(dt_val: Union[datetime, int, float, None] = None, delim=' ', cached: bool = False) -> str:
     """
     datetime时间格式化为GMT时间字符串
     Args:
         dt_val: 时间值类型为datetime,int,float
         delim: 间隔字符串
+        cached: 格式化当前时间时是否使用按秒缓存的结果,用于每个请求都需要的Date等响应头
     Returns:
         eg； Thu, 12 Mar 2020 11:21:04 GMT
     """
+    if cached and dt_val is None and delim == ' ':
+        return cached_time2gmt()
     if isinstance(dt_val, datetime):
         dt_val_ = dt_val.timetuple()
     elif isinstance(dt_val, (int, float)):
@@ -41,15 +160,25 @@ def time2gmt(dt_val: Union[datetime, int, float, None] = None, delim=' ') -> str
     )
 
 
-def time2ymd(dt_val: Union[datetime, int, float, None] = None) -> str:
+def time2ymd(dt_val: Union[datetime, int, float, None] = None, cached: bool = False,
+             tz: Union[str, tzinfo, None] = None) -> str:
     """
     datetime时间格式化为Y-M-D的格式
     Args:
         dt_val: Union[datetime, int, float, None] = None, delim=' '
+        cached: 格式化当前时间时是否使用按秒缓存的结果,用于每条日志都需要的时间
+        tz: 时区名称或者tzinfo,指定时格式化为该时区的时间,否则为本地时间
     Returns:
         eg: 2020-03-12 11:21:04
     """
-    if isinstance(dt_val, datetime):
+    if tz is not None:
+        zone = _get_zone(tz)
+        if not isinstance(dt_val, datetime):
+            return zone.format(_floor_second(dt_val if isinstance(dt_val, (int, float)) else time()))
+        dt_val_ = (dt_val.astimezone(zone.zone) if dt_val.tzinfo is not None else dt_val).timetuple()
+    elif cached and dt_val is None:
+        return cached_time2ymd()
+    elif isinstance(dt_val, datetime):
         dt_val_ = dt_val.timetuple()
     elif isinstance(dt_val, (int, float)):
         dt_val_ = localtime(dt_val)
@@ -60,15 +189,24 @@ def time2ymd(dt_val: Union[datetime, int, float, None] = None) -> str:
         str(dt_val_.tm_year), dt_val_.tm_mon, dt_val_.tm_mday, dt_val_.tm_hour, dt_val_.tm_min, dt_val_.tm_sec)
 
 
-def time2iso(dt_val: Union[datetime, int, float, None] = None) -> str:
+def time2iso(dt_val: Union[datetime, int, float, None] = None, tz: Union[str, tzinfo, None] = None) -> str:
     """
     datetime时间格式化为ISO时间字符串
     Args:
        dt_val: 时间值类型为datetime,int,float
+       tz: 时区名称或者tzinfo,指定时格式化为该时区带偏移的时间
     Returns:
-        eg :2020-03-12T11:49:31.392460
+        eg :2020-03-12T11:49:31.392460, 指定tz时eg: 2020-03-12T11:49:31.392460+08:00
     """
-    if isinstance(dt_val, (int, float)):
+    if tz is not None:
+        zone = _get_zone(tz)
+        if isinstance(dt_val, datetime):
+            dt_val_ = dt_val.astimezone(zone.zone) if dt_val.tzinfo is not None else dt_val.replace(tzinfo=zone.zone)
+        elif isinstance(dt_val, (int, float)):
+            return zone.format(_floor_second(dt_val), iso=True)
+        else:
+            dt_val_ = datetime.now(zone.zone)
+    elif isinstance(dt_val, (int, float)):
         dt_val__ = localtime(dt_val)
         dt_val_ = datetime.fromtimestamp(mktime(dt_val__))
     else:
@@ -77,15 +215,21 @@ def time2iso(dt_val: Union[datetime, int, float, None] = None) -> str:
     return dt_val_.isoformat()
 
 
-def time2stamp(dt_val: Union[datetime, int, float, None] = None, length=13) -> int:
+def time2stamp(dt_val: Union[datetime, int, float, None] = None, length=13,
+               tz: Union[str, tzinfo, None] = None) -> int:
     """
     datetime时间格式化为timestamp 13位时间戳
     Args:
        dt_val: 时间值类型为datetime,int,float
        length: 时间戳长度
+       tz: 时区名称或者tzinfo,指定时没有时区的datetime作为该时区的时间
     Returns:
         eg :1583985504763
     """
+    if tz is not None and isinstance(dt_val, datetime):
+        if dt_val.tzinfo is None:
+            dt_val = dt_val.replace(tzinfo=_get_zone(tz).zone)
+        return int(dt_val.timestamp() * 1000) if length == 13 else int(dt_val.timestamp())
     if isinstance(dt_val, (int, float)):
         dt_val__ = localtime(dt_val)
         dt_val_ = datetime.fromtimestamp(mktime(dt_val__))
@@ -95,26 +239,70 @@ def time2stamp(dt_val: Union[datetime, int, float, None] = None, length=13) -> i
     return int(dt_val_.timestamp() * 1000) if length == 13 else int(dt_val_.timestamp())
 
 
-def gmt2time(gmt_val: str) -> datetime:
+def _parse_gmt(gmt_val: str) -> datetime:
+    """
+    按照固定位置解析GMT字符串时间,格式不符时使用strptime解析
+    """
+    if len(gmt_val) == 29 and gmt_val[3:5] == ", " and gmt_val[7] == " " and gmt_val[11] == " " and \
+            gmt_val[16] == " " and gmt_val[19] == ":" and gmt_val[22] == ":" and gmt_val[25:] == " GMT" and \
+            gmt_val[:3] in _WEEKDAYS:
+        month = _MONTHS.get(gmt_val[8:11])
+        digits = gmt_val[5:7] + gmt_val[12:16] + gmt_val[17:19] + gmt_val[20:22] + gmt_val[23:25]
+        if month is not None and digits.isdigit():
+            try:
+                return datetime(int(digits[2:6]), month, int(digits[:2]),
+                                int(digits[6:8]), int(digits[8:10]), int(digits[10:]))
+            except ValueError:
+                pass
+    return datetime.strptime(gmt_val, '%a, %d %b %Y %H:%M:%S GMT')
+
+
+def _parse_ymd(ymd_val: str) -> datetime:
+    """
+    按照固定位置解析年月日字符串时间,格式不符时使用strptime解析
+    """
+    if len(ymd_val) == 19 and ymd_val[4] == "-" and ymd_val[7] == "-" and ymd_val[10] == " " and \
+            ymd_val[13] == ":" and ymd_val[16] == ":":
+        digits = ymd_val[:4] + ymd_val[5:7] + ymd_val[8:10] + ymd_val[11:13] + ymd_val[14:16] + ymd_val[17:]
+        if digits.isdigit():
+            try:
+                return datetime(int(digits[:4]), int(digits[4:6]), int(digits[6:8]),
+                                int(digits[8:10]), int(digits[10:12]), int(digits[12:]))
+            except ValueError:
+                pass
+    return datetime.strptime(ymd_val, '%Y-%m-%d %H:%M:%S')
+
+
+_cached_parse_gmt = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse_gmt)
+_cached_parse_ymd = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse_ymd)
+
+
+def gmt2time(gmt_val: str, cached: bool = False) -> datetime:
     """
     解析GMT字符串时间到datetime类型
+
+    标准格式直接按照固定位置解析,其他格式使用strptime解析
     Args:
         gmt_val: gmt时间字符串, eg: Thu, 12 Mar 2020 11:21:04 GMT
+        cached: 是否缓存解析结果,用于大量重复的时间字符串,比如日志
     Returns:
         datetime
     """
-    return datetime.strptime(gmt_val, '%a, %d %b %Y %H:%M:%S GMT')
+    return _cached_parse_gmt(gmt_val) if cached else _parse_gmt(gmt_val)
 
 
-def ymd2time(ymd_val: str) -> datetime:
+def ymd2time(ymd_val: str, cached: bool = False) -> datetime:
     """
     解析年月日字符串时间到datetime类型
+
+    标准格式直接按照固定位置解析,其他格式使用strptime解析
     Args:
         ymd_val: 年月日时间字符串, eg: 2020-03-12 11:21:04
+        cached: 是否缓存解析结果,用于大量重复的时间字符串,比如日志
     Returns:
         datetime
     """
-    return datetime.strptime(ymd_val, '%Y-%m-%d %H:%M:%S')
+    return _cached_parse_ymd(ymd_val) if cached else _parse_ymd(ymd_val)
 
 
 def iso2time(iso_val: str) -> datetime:
@@ -132,20 +320,417 @@ def iso2time(iso_val: str) -> datetime:
     return dt_val
 
 
-def stamp2time(stamp_val: Union[int, float, str]) -> datetime:
+def stamp2time(stamp_val: Union[int, float, str], tz: Union[str, tzinfo, None] = None) -> datetime:
     """
     解析time stamp时间戳到datetime类型
     Args:
         stamp_val: 年月日时间字符串, eg: 1583985504763
+        tz: 时区名称或者tzinfo,指定时返回该时区的datetime
     Returns:
         datetime
     """
+    if tz is not None:
+        return datetime.fromtimestamp(_normalize_stamp(stamp_val), _get_zone(tz).zone)
+    return datetime.fromtimestamp(_normalize_stamp(stamp_val))
+
+
+class CachedTimeFormatter(object):
+    """
+    按秒缓存当前时间的格式化结果,同一秒内只格式化一次
+
+    缓存的(秒, 字符串)元祖整体替换,读取时不需要加锁,多线程同时刷新时最多重复格式化一次。
+    每次调用都会检查当前的秒数,过期时惰性刷新;在asyncio中可以调用start启动每秒的定时刷新,
+    这样请求中基本不会再执行格式化。
+    eg:
+        date_header = cached_time2gmt()
+
+        formatter = CachedTimeFormatter(lambda second: time2gmt(second, delim='-'))
+        formatter.start()
+    """
+
+    def __init__(self, formatter: Callable[[int], str]):
+        """
+            按秒缓存当前时间的格式化结果
+        Args:
+            formatter: 格式化函数,参数为整数秒的时间戳
+        """
+        self._formatter = formatter
+        self._cache = (-1, "")
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def __call__(self) -> str:
+        """
+        当前时间的格式化结果
+        """
+        second = int(time())
+        cache = self._cache
+        if cache[0] != second:
+            cache = self._cache = (second, self._formatter(second))
+        return cache[1]
+
+    def _tick(self, loop: asyncio.AbstractEventLoop):
+        """
+        刷新缓存,并在下一秒开始时再次刷新
+        """
+        self()
+        self._handle = loop.call_later(1 - time() % 1, self._tick, loop)
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        在事件循环中启动每秒的定时刷新,重复调用不会重复启动
+        Args:
+            loop: 事件循环,默认为当前的事件循环
+        Returns:
+
+        """
+        if self._handle is None:
+            self._tick(loop or asyncio.get_event_loop())
+
+    def stop(self):
+        """
+        停止定时刷新
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+cached_time2gmt = CachedTimeFormatter(time2gmt)
+cached_time2ymd = CachedTimeFormatter(time2ymd)
+
+
+def _to_list(values: Iterable) -> Sequence:
+    """
+    numpy数组转换为python对象的列表,其他的序列原样返回,迭代器转换为列表
+    """
+    if hasattr(values, "dtype") and hasattr(values, "tolist"):
+        return values.tolist()
+    return values if isinstance(values, (list, tuple, array)) else list(values)
+
+
+def _floor_second(stamp_val: Union[int, float]) -> int:
+    """
+    向下取整到秒,和localtime的取整方式一致
+    """
+    second = int(stamp_val)
+    return second - 1 if second > stamp_val else second
+
+
+def _minute_prefix(minute: int, fmt: str) -> str:
+    """
+    格式化本地时间到分钟的部分
+    Args:
+        minute: 从1970年开始的分钟数
+        fmt: 格式化年月日时分的格式
+    Returns:
+        这一分钟内时区偏移有变化或者偏移不是整分钟时返回空字符串,需要逐个调用localtime
+    """
+    start, end = localtime(minute * 60), localtime(minute * 60 + 59)
+    if start.tm_sec != 0 or end.tm_sec != 59 or start[:5] != end[:5]:
+        return ""
+    return fmt % start[:5]
+
+
+def _format_times(values: Iterable, fmt: str, format_dt, format_other) -> List[str]:
+    """
+    批量格式化时间,时间戳按照分钟缓存本地时间的前缀,同一分钟内只调用一次localtime
+    Args:
+        values: 时间值
+        fmt: 格式化年月日时分的格式,秒直接拼接在后面
+        format_dt: 格式化datetime的函数
+        format_other: 格式化其他值的函数
+    Returns:
+        格式化后的字符串列表
+    """
+    prefixes: Dict[int, str] = {}
+    result: List[str] = []
+    append = result.append
+    for val in _to_list(values):
+        if val.__class__ is int or val.__class__ is float:
+            second = _floor_second(val)
+            minute = second // 60
+            prefix = prefixes.get(minute)
+            if prefix is None:
+                prefix = prefixes[minute] = _minute_prefix(minute, fmt)
+            if prefix:
+                append(prefix + _SECONDS[second - minute * 60])
+            else:
+                local_val = localtime(second)
+                append(fmt % local_val[:5] + _SECONDS[local_val.tm_sec])
+        elif isinstance(val, datetime):
+            append(format_dt(val))
+        else:
+            append(format_other(val))
+    return result
+
+
+def times2ymd(values: Iterable[Union[datetime, int, float]], tz: Union[str, tzinfo, None] = None) -> List[str]:
+    """
+    批量格式化为Y-M-D的格式,结果和逐个调用time2ymd一致
+    Args:
+        values: 时间值的序列,元素类型为datetime,int,float,支持array和numpy数组
+        tz: 时区名称或者tzinfo,指定时格式化为该时区的时间,否则为本地时间
+    Returns:
+        eg: ["2020-03-12 11:21:04", ...]
+    """
+    if tz is not None:
+        zone = _get_zone(tz)
+        return [zone.format(_floor_second(val)) if val.__class__ is int or val.__class__ is float
+                else time2ymd(val, tz=tz) for val in _to_list(values)]
+    return _format_times(values, "%d-%02d-%02d %02d:%02d:", lambda dt_val: '%d-%02d-%02d %02d:%02d:%02d' % (
+        dt_val.year, dt_val.month, dt_val.day, dt_val.hour, dt_val.minute, dt_val.second), time2ymd)
+
+
+def times2iso(values: Iterable[Union[datetime, int, float]], tz: Union[str, tzinfo, None] = None) -> List[str]:
+    """
+    批量格式化为ISO时间字符串,时间戳精确到秒,datetime保留微秒
+    Args:
+        values: 时间值的序列,元素类型为datetime,int,float,支持array和numpy数组
+        tz: 时区名称或者tzinfo,指定时格式化为该时区带偏移的时间,结果和逐个调用time2iso一致
+    Returns:
+        eg: ["2020-03-12T11:49:31", ...]
+    """
+    if tz is not None:
+        zone = _get_zone(tz)
+        return [zone.format(_floor_second(val), iso=True) if val.__class__ is int or val.__class__ is float
+                else time2iso(val, tz) for val in _to_list(values)]
+    return _format_times(values, "%04d-%02d-%02dT%02d:%02d:", datetime.isoformat, time2iso)
+
 
+def times2stamp(values: Iterable[Union[datetime, int, float]], length=13,
+                tz: Union[str, tzinfo, None] = None) -> Union[List[int], array, Any]:
+    """
+    批量转换为时间戳,时间戳精确到秒
+    Args:
+        values: 时间值的序列,元素类型为datetime,int,float,支持array和numpy数组
+        length: 时间戳长度,13位或者10位
+        tz: 时区名称或者tzinfo,指定时没有时区的datetime作为该时区的时间
+    Returns:
+        输入是numpy数值数组时返回int64数组,输入是array时返回array('q'),否则返回列表
+    """
+    multiple = 1000 if length == 13 else 1
+    if hasattr(values, "dtype") and getattr(values.dtype, "kind", "") in "iuf":
+        return (cast(Any, values) // 1).astype("int64") * multiple
+    result: List[int] = []
+    append = result.append
+    for val in _to_list(values):
+        if val.__class__ is int or val.__class__ is float:
+            append(_floor_second(val) * multiple)
+        elif isinstance(val, datetime):
+            if tz is not None and val.tzinfo is None:
+                val = val.replace(tzinfo=_get_zone(tz).zone)
+            append(int(val.timestamp() * multiple))
+        else:
+            append(time2stamp(val, length))
+    return array("q", result) if isinstance(values, array) else result
+
+
+def _normalize_stamp(stamp_val: Union[int, float, str]) -> float:
+    """
+    把时间戳转换为秒,前10位为秒,其余的数字都作为小数部分
+    """
+    if isinstance(stamp_val, (int, float)):
+        if 0 <= stamp_val < 10000000000:
+            return stamp_val
+        if isinstance(stamp_val, int) and stamp_val > 0:
+            # 整数的除法是精确舍入的,和解析拼接后的小数字符串结果一致
+            return stamp_val / 10 ** (len(str(stamp_val)) - 10)
+    # 小数需要按照十进制的数字拆分,直接除法会有舍入误差
     left, *right = str(stamp_val).split(".")
     dot_right = "".join(right)
     left_, right_ = left[:10], left[10:]
-    stamp_val = float(f"{left_}.{right_}{dot_right}")
-    return datetime.fromtimestamp(stamp_val)
+    return float(f"{left_}.{right_}{dot_right}")
+
+
+def stamps2time(values: Iterable[Union[int, float, str]], tz: Union[str, tzinfo, None] = None) -> List[datetime]:
+    """
+    批量解析时间戳到datetime类型,结果和逐个调用stamp2time一致,10位以上的整数时间戳使用除法换算为秒,不需要字符串处理
+    Args:
+        values: 时间戳的序列,eg: [1583985504763, 1583985504.763, ...],支持array和numpy数组
+        tz: 时区名称或者tzinfo,指定时返回该时区的datetime
+    Returns:
+        datetime的列表
+    """
+    fromtimestamp = datetime.fromtimestamp
+    if tz is not None:
+        zone = _get_zone(tz).zone
+        return [fromtimestamp(_normalize_stamp(val), zone) for val in _to_list(values)]
+    return [fromtimestamp(_normalize_stamp(val)) for val in _to_list(values)]
+
+
+def ymds2time(values: Iterable[str]) -> List[datetime]:
+    """
+    批量解析年月日字符串时间到datetime类型,同样的字符串只解析一次
+    Args:
+        values: 年月日时间字符串的序列, eg: ["2020-03-12 11:21:04", ...]
+    Returns:
+        datetime的列表
+    """
+    parsed: Dict[str, datetime] = {}
+    result: List[datetime] = []
+    append = result.append
+    for val in values:
+        dt_val = parsed.get(val)
+        if dt_val is None:
+            dt_val = parsed[val] = _parse_ymd(val)
+        append(dt_val)
+    return result
+
+
+# 固定长度的时间桶的秒数
+_BUCKET_SECONDS = {"minute": 60, "hour": 3600, "day": 86400, "week": 604800}
+# 生成表名后缀的格式, (年, 月, 日, 时)
+_SUFFIX_FORMATS = {"hour": "%04d%02d%02d%02d", "day": "%04d%02d%02d", "month": "%04d%02d"}
+
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    """
+    年月日转换为从1970-01-01开始的天数,只使用整数运算
+    """
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+
+def _civil_from_days(days: int) -> Tuple[int, int, int]:
+    """
+    从1970-01-01开始的天数转换为(年, 月, 日),只使用整数运算
+    """
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    month = mp + (3 if mp < 10 else -9)
+    return yoe + era * 400 + (month <= 2), month, doy - (153 * mp + 2) // 5 + 1
+
+
+def _utc_offset(utc_offset: Optional[int]) -> int:
+    """
+    UTC偏移秒数,None时为当前的本地偏移
+    """
+    return localtime().tm_gmtoff if utc_offset is None else utc_offset
+
+
+def _month_bucket(stamp_val: Union[int, float], utc_offset: int) -> int:
+    """
+    时间戳所在月份开始的时间戳
+    """
+    year, month, _ = _civil_from_days(int((stamp_val + utc_offset) // 86400))
+    return _days_from_civil(year, month, 1) * 86400 - utc_offset
+
+
+def time_bucket(stamp_val: Union[int, float], unit: Union[str, int] = "minute",
+                utc_offset: Optional[int] = None) -> int:
+    """
+    把时间戳截断到所在时间桶的开始,只使用整数运算
+    eg:
+        time_bucket(1583985504, "hour", 8 * 3600) -> 1583982000 即 2020-03-12 11:00:00+08:00
+    Args:
+        stamp_val: 10位的秒级时间戳
+        unit: 时间桶的单位, minute,hour,day,week(周一开始),month,或者桶的秒数
+        utc_offset: 时间桶按照这个UTC偏移秒数对齐,比如东八区为8 * 3600,None时为当前的本地偏移
+    Returns:
+        时间桶开始的秒级时间戳
+    """
+    utc_offset = _utc_offset(utc_offset)
+    if unit == "month":
+        return _month_bucket(stamp_val, utc_offset)
+    size = _BUCKET_SECONDS[unit] if isinstance(unit, str) else unit
+    # 1970-01-01是周四,周从周一开始对齐
+    shift = utc_offset + (259200 if unit == "week" else 0)
+    return int((stamp_val + shift) // size * size - shift)
+
+
+def time_buckets(values: Iterable[Union[int, float]], unit: Union[str, int] = "minute",
+                 utc_offset: Optional[int] = None) -> Union[List[int], array, Any]:
+    """
+    批量把时间戳截断到所在时间桶的开始,用于聚合统计
+    Args:
+        values: 10位的秒级时间戳的序列,支持array和numpy数组
+        unit: 时间桶的单位, minute,hour,day,week(周一开始),month,或者桶的秒数
+        utc_offset: 时间桶按照这个UTC偏移秒数对齐,None时为当前的本地偏移
+    Returns:
+        输入是numpy数值数组时返回int64数组,输入是array时返回array('q'),否则返回列表
+    """
+    utc_offset = _utc_offset(utc_offset)
+    is_numpy = hasattr(values, "dtype") and getattr(values.dtype, "kind", "") in "iuf"
+    if unit == "month":
+        months: Dict[int, int] = {}
+        result = []
+        for val in _to_list(values):
+            days = int((val + utc_offset) // 86400)
+            bucket = months.get(days)
+            if bucket is None:
+                bucket = months[days] = _month_bucket(val, utc_offset)
+            result.append(bucket)
+        if is_numpy:
+            import numpy as np
+            return np.asarray(result, dtype="int64")
+    else:
+        size = _BUCKET_SECONDS[unit] if isinstance(unit, str) else unit
+        shift = utc_offset + (259200 if unit == "week" else 0)
+        if is_numpy:
+            return ((cast(Any, values) + shift) // size * size - shift).astype("int64")
+        result = [int((val + shift) // size * size - shift) for val in _to_list(values)]
+    return array("q", result) if isinstance(values, array) else result
+
+
+def bucket_range(start: Union[int, float], end: Union[int, float], unit: Union[str, int] = "day",
+                 utc_offset: Optional[int] = None) -> Sequence[int]:
+    """
+    start和end之间所有时间桶的开始时间戳,包含start和end所在的时间桶
+    Args:
+        start: 开始的秒级时间戳
+        end: 结束的秒级时间戳
+        unit: 时间桶的单位, minute,hour,day,week(周一开始),month,或者桶的秒数
+        utc_offset: 时间桶按照这个UTC偏移秒数对齐,None时为当前的本地偏移
+    Returns:
+        固定长度的时间桶返回range,month返回列表
+    """
+    utc_offset = _utc_offset(utc_offset)
+    first, last = time_bucket(start, unit, utc_offset), time_bucket(end, unit, utc_offset)
+    if unit != "month":
+        return range(first, last + 1, _BUCKET_SECONDS[unit] if isinstance(unit, str) else unit)
+    year, month, _ = _civil_from_days((first + utc_offset) // 86400)
+    buckets = []
+    while first <= last:
+        buckets.append(first)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        first = _days_from_civil(year, month, 1) * 86400 - utc_offset
+    return buckets
+
+
+def table_suffixes(start: Union[int, float], end: Union[int, float], unit: str = "day",
+                   utc_offset: Optional[int] = None) -> List[str]:
+    """
+    start和end之间所有分表的表名后缀,可以直接用于gen_schema和pregen_schemas
+    eg:
+        table_suffixes(1583985504, 1584158304, "day", 8 * 3600) -> ["20200312", "20200313", "20200314"]
+    Args:
+        start: 开始的秒级时间戳
+        end: 结束的秒级时间戳
+        unit: 分表的单位, hour: 2020031211, day: 20200312, month: 202003
+        utc_offset: 按照这个UTC偏移秒数分表,None时为当前的本地偏移
+    Returns:
+        表名后缀列表
+    """
+    fmt = _SUFFIX_FORMATS[unit]
+    utc_offset = _utc_offset(utc_offset)
+    suffixes = []
+    for bucket in bucket_range(start, end, unit, utc_offset):
+        days, clock = divmod(bucket + utc_offset, 86400)
+        year, month, day = _civil_from_days(days)
+        if unit == "hour":
+            suffixes.append(fmt % (year, month, day, clock // 3600))
+        elif unit == "day":
+            suffixes.append(fmt % (year, month, day))
+        else:
+            suffixes.append(fmt % (year, month))
+    return suffixes
 
 
 if __name__ == '__main__':
@@ -158,3 +743,88 @@ if __name__ == '__main__':
     print(stamp2time("1583986340707"))
     print(stamp2time(1583986340.707))
     print(stamp2time(1583986340707.111))
+
+    import timeit
+
+    _stamps = [time() - i * 0.37 for i in range(100000)]
+    _stamps_ms = [int(val * 1000) for val in _stamps]
+    _datetimes = stamps2time(_stamps)
+    _ymds = times2ymd(_stamps)
+    assert _ymds == [time2ymd(val) for val in _stamps]
+    assert times2iso(_stamps) == [time2iso(val) for val in _stamps]
+    assert times2stamp(_stamps) == [time2stamp(val) for val in _stamps]
+    assert stamps2time(_stamps_ms) == [stamp2time(val) for val in _stamps_ms]
+    _float_stamps_ms = [val * 1000 for val in _stamps[:20000]]
+    assert stamps2time(_float_stamps_ms) == [stamp2time(val) for val in _float_stamps_ms]
+    assert ymds2time(_ymds) == [ymd2time(val) for val in _ymds]
+    for _name, _scalar, _bulk in (
+            ("time2ymd", lambda: [time2ymd(val) for val in _stamps], lambda: times2ymd(_stamps)),
+            ("time2iso", lambda: [time2iso(val) for val in _stamps], lambda: times2iso(_stamps)),
+            ("time2stamp", lambda: [time2stamp(val) for val in _stamps], lambda: times2stamp(_stamps)),
+            ("stamp2time", lambda: [stamp2time(val) for val in _stamps_ms], lambda: stamps2time(_stamps_ms)),
+            ("ymd2time", lambda: [ymd2time(val) for val in _ymds], lambda: ymds2time(_ymds))):
+        _scalar_elapsed = min(timeit.repeat(_scalar, number=1, repeat=3))
+        _bulk_elapsed = min(timeit.repeat(_bulk, number=1, repeat=3))
+        print("{:<12} scalar {:>8.1f}ms  bulk {:>8.1f}ms  x{:.1f}".format(
+            _name, _scalar_elapsed * 1e3, _bulk_elapsed * 1e3, _scalar_elapsed / _bulk_elapsed))
+
+    # 日志中同一秒的时间字符串大量重复
+    _log_stamps = [_stamps[0] - i * 0.05 for i in range(100000)]
+    _gmts, _ymds = [time2gmt(val) for val in _log_stamps], times2ymd(_log_stamps)
+    assert [gmt2time(val) for val in _gmts] == [datetime.strptime(val, '%a, %d %b %Y %H:%M:%S GMT') for val in _gmts]
+    assert [ymd2time(val) for val in _ymds] == [datetime.strptime(val, '%Y-%m-%d %H:%M:%S') for val in _ymds]
+    for _name, _values, _fmt, _func in (("gmt2time", _gmts, '%a, %d %b %Y %H:%M:%S GMT', gmt2time),
+                                        ("ymd2time", _ymds, '%Y-%m-%d %H:%M:%S', ymd2time)):
+        for _mode, _parse in (("strptime", lambda: [datetime.strptime(val, _fmt) for val in _values]),
+                              ("fixed", lambda: [_func(val) for val in _values]),
+                              ("cached", lambda: [_func(val, cached=True) for val in _values])):
+            _elapsed = min(timeit.repeat(_parse, number=1, repeat=3))
+            print("{:<12} {:<8} {:>6.2f}us".format(_name, _mode, _elapsed / len(_values) * 1e6))
+
+    async def _bench_tick():
+        cached_time2gmt.start()
+        await asyncio.sleep(1.2)
+        assert cached_time2gmt() == time2gmt()
+        cached_time2gmt.stop()
+
+    asyncio.get_event_loop().run_until_complete(_bench_tick())
+    for _name, _format in (("time2gmt", lambda: time2gmt()), ("cached_time2gmt", lambda: cached_time2gmt()),
+                           ("time2ymd", lambda: time2ymd()), ("cached_time2ymd", lambda: cached_time2ymd())):
+        _elapsed = min(timeit.repeat(_format, number=100000, repeat=3))
+        print("{:<16} {:>6.3f}us".format(_name, _elapsed / 100000 * 1e6))
+
+    if ZoneInfo is not None:
+        _zone = ZoneInfo("America/New_York")
+        _tz_stamps = [_stamps[0] - i * 97.3 for i in range(100000)]  # 覆盖夏令时的切换
+        assert stamps2time(_tz_stamps, tz="America/New_York") == [
+            datetime.fromtimestamp(val, _zone) for val in _tz_stamps]
+        assert times2ymd(_tz_stamps, tz="America/New_York") == [
+            datetime.fromtimestamp(val, _zone).strftime('%Y-%m-%d %H:%M:%S') for val in _tz_stamps]
+        assert times2iso(_tz_stamps, tz="America/New_York") == [
+            datetime.fromtimestamp(int(val), _zone).isoformat() for val in _tz_stamps]
+        for _name, _plain, _cached in (
+                ("time2ymd", lambda: [datetime.fromtimestamp(val, _zone).strftime('%Y-%m-%d %H:%M:%S')
+                                      for val in _tz_stamps],
+                 lambda: times2ymd(_tz_stamps, tz="America/New_York")),
+                ("time2iso", lambda: [datetime.fromtimestamp(int(val), _zone).isoformat() for val in _tz_stamps],
+                 lambda: times2iso(_tz_stamps, tz="America/New_York"))):
+            _plain_elapsed = min(timeit.repeat(_plain, number=1, repeat=3))
+            _cached_elapsed = min(timeit.repeat(_cached, number=1, repeat=3))
+            print("tz {:<10} zoneinfo {:>8.1f}ms  cached offsets {:>8.1f}ms".format(
+                _name, _plain_elapsed * 1e3, _cached_elapsed * 1e3))
+
+    _offset = 8 * 3600
+    assert table_suffixes(1583985504, 1584158304, "day", _offset) == ["20200312", "20200313", "20200314"]
+    assert table_suffixes(1577836800 - _offset, 1583985504, "month", _offset) == [
+        "202001", "202002", "202003"]
+    assert time_buckets(_stamps, "week", _offset) == [
+        time2stamp(datetime.fromtimestamp(val, timezone(timedelta(seconds=_offset))).replace(
+            hour=0, minute=0, second=0, microsecond=0) - timedelta(
+            days=datetime.fromtimestamp(val, timezone(timedelta(seconds=_offset))).weekday()), 10, "UTC")
+        for val in _stamps]
+    for _name, _bucket in (
+            ("datetime", lambda: [int(datetime.fromtimestamp(val, timezone.utc).replace(
+                minute=0, second=0, microsecond=0).timestamp()) for val in _stamps]),
+            ("time_buckets", lambda: time_buckets(_stamps, "hour", 0))):
+        _elapsed = min(timeit.repeat(_bucket, number=1, repeat=3))
+        print("hour bucket {:<14} {:>8.1f}ms".format(_name, _elapsed * 1e3))
@@ -11,16 +11,26 @@
 
 import asyncio
 import inspect
-from collections import MutableMapping, Sequence
+import random
+import threading
+import time
+import weakref
+from collections import MutableMapping, Sequence, deque
+from concurrent.futures import (CancelledError as FutureCancelledError, Executor, Future,
+                                TimeoutError as FutureTimeoutError)
 from contextlib import contextmanager
 from functools import wraps
+from typing import (Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional,
+                    Set, Tuple, Type, Union)
 
 from aiocontext import async_contextmanager
 
-from ._poolutils import pool
-from .err import Error, FuncArgsError
+from ._poolutils import Bulkhead, pool
+from .err import BulkheadFullError, CircuitOpenError, Error, FuncArgsError, FuncTimeoutError
 
-__all__ = ("singleton", "ignore_error", "wrap_async_func", "wrap_async_funcs", "async_ignore_error")
+__all__ = ("singleton", "ignore_error", "wrap_async_func", "wrap_async_funcs", "async_ignore_error",
+           "iter_async_funcs", "run_in_pool", "RetryBudget", "retry", "async_retry", "timeout", "async_timeout",
+           "CircuitBreaker")
 
 
 def singleton(cls):
@@ -86,7 +96,18 @@ async def wrap_async_func(func, *args, **kwargs):
         返回执行后的结果
     """
     try:
-        result = await asyncio.wrap_future(pool.submit(func, *args, **kwargs))
+        future = pool.submit(func, *args, **kwargs)
+    except Exception as e:
+        raise Error("Error: {}".format(e))
+    return await _wait_pool_future(future)
+
+
+async def _wait_pool_future(future: Future) -> Any:
+    """
+    等待线程池中的任务完成,异常转换同wrap_async_func
+    """
+    try:
+        result = await asyncio.wrap_future(future)
     except TypeError as e:
         raise FuncArgsError("Args error: {}".format(e))
     except Exception as e:
@@ -95,32 +116,777 @@ async def wrap_async_func(func, *args, **kwargs):
         return result
 
 
-async def wrap_async_funcs(funcs: list):
+class RetryBudget(object):
     """
-    批量包装同步方法为异步，批量执行
+    重试预算,多个调用共享,防止下游故障时重试把流量放大
+
+    每次调用存入ratio个重试令牌,每次重试取出一个,令牌不足时不再重试;min_retries为初始令牌数,
+    保证低流量时也可以重试
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, max_retries: int = 100):
+        """
+            重试预算
+        Args:
+            ratio: 每次调用存入的重试令牌数,0.2表示重试次数最多为调用次数的20%
+            min_retries: 初始的重试令牌数
+            max_retries: 最多积攒的重试令牌数
+        """
+        self.ratio = ratio
+        self.max_retries = max(min_retries, max_retries)
+        self._balance = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """
+        每次调用存入重试令牌
+        """
+        with self._lock:
+            self._balance = min(self.max_retries, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        每次重试前取出一个重试令牌
+        Returns:
+            令牌不足时返回False
+        """
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class _RetryPolicy(object):
+    """
+    retry和async_retry共用的重试策略
+    """
+
+    def __init__(self, tries: int, delay: float, backoff: float, max_delay: float, jitter: bool,
+                 exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]],
+                 policies: Optional[Dict[Type[BaseException], int]], budget: Optional[RetryBudget]):
+        if tries < 1:
+            raise FuncArgsError("Tries must be a positive integer, tries={}".format(tries))
+        self.tries = tries
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.exceptions = exceptions
+        self.policies = policies or {}
+        self.budget = budget
+
+    def max_tries(self, error: BaseException) -> int:
+        """
+        异常对应的最大尝试次数,policies中的优先
+        """
+        for error_cls, tries in self.policies.items():
+            if isinstance(error, error_cls):
+                return tries
+        return self.tries if isinstance(error, self.exceptions) else 1
+
+    def next_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        计算下一次重试前等待的时间
+        Args:
+            attempt: 已经尝试的次数
+            error: 本次尝试的异常
+        Returns:
+            不需要重试时返回None
+        """
+        if attempt >= self.max_tries(error):
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+        delay = min(self.max_delay, self.delay * self.backoff ** (attempt - 1))
+        # full jitter,避免多个客户端同时重试
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+def retry(tries: int = 3, delay: float = 0.1, backoff: float = 2, max_delay: float = 10, jitter: bool = True,
+          exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]] = Exception,
+          policies: Optional[Dict[Type[BaseException], int]] = None, budget: Optional[RetryBudget] = None,
+          on_retry: Optional[Callable] = None, on_giveup: Optional[Callable] = None,
+          on_success: Optional[Callable] = None) -> Callable:
+    """
+    同步函数失败后按照指数退避重试
+
+    和cached一起使用时cached放在外层,这样只会缓存成功的结果
+    eg:
+        @cached(LRU())
+        @retry(tries=3, exceptions=(ConnectionError,), policies={TimeoutError: 2})
+        def query(key): ...
+    Args:
+        tries: 最大尝试次数,包含第一次调用
+        delay: 第一次重试前等待的时间,单位秒
+        backoff: 每次重试等待时间的倍数
+        max_delay: 最大的等待时间
+        jitter: 是否在[0, delay]之间随机等待
+        exceptions: 需要重试的异常
+        policies: 按异常类型指定的最大尝试次数,优先于exceptions和tries,值为1时表示该异常不重试
+        budget: 重试预算,多个函数可以共享同一个预算
+        on_retry: 重试前的回调, on_retry(func, attempt, error, delay)
+        on_giveup: 放弃重试时的回调, on_giveup(func, attempt, error)
+        on_success: 调用成功时的回调, on_success(func, attempt, elapsed), elapsed为包含重试的总耗时
+    Returns:
+
+    """
+    policy = _RetryPolicy(tries, delay, backoff, max_delay, jitter, exceptions, policies, budget)
+
+    def _retry(func):
+        """
+        重试装饰器
+        """
+
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            if policy.budget is not None:
+                policy.budget.deposit()
+            start, attempt = time.monotonic(), 0
+            while True:
+                attempt += 1
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    next_delay = policy.next_delay(attempt, e)
+                    if next_delay is None:
+                        if on_giveup is not None:
+                            on_giveup(func, attempt, e)
+                        raise
+                    if on_retry is not None:
+                        on_retry(func, attempt, e, next_delay)
+                    time.sleep(next_delay)
+                else:
+                    if on_success is not None:
+                        on_success(func, attempt, time.monotonic() - start)
+                    return result
+
+        return _wrapper
+
+    return _retry
+
+
+def async_retry(tries: int = 3, delay: float = 0.1, backoff: float = 2, max_delay: float = 10, jitter: bool = True,
+                exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]] = Exception,
+                policies: Optional[Dict[Type[BaseException], int]] = None, budget: Optional[RetryBudget] = None,
+                on_retry: Optional[Callable] = None, on_giveup: Optional[Callable] = None,
+                on_success: Optional[Callable] = None) -> Callable:
+    """
+    异步函数失败后按照指数退避重试,参数同retry
+
+    eg:
+        @async_retry(tries=3, exceptions=(ConnectionError,))
+        async def query(key): ...
+    Args:
+        tries: 最大尝试次数,包含第一次调用
+        delay: 第一次重试前等待的时间,单位秒
+        backoff: 每次重试等待时间的倍数
+        max_delay: 最大的等待时间
+        jitter: 是否在[0, delay]之间随机等待
+        exceptions: 需要重试的异常
+        policies: 按异常类型指定的最大尝试次数,优先于exceptions和tries,值为1时表示该异常不重试
+        budget: 重试预算,多个函数可以共享同一个预算
+        on_retry: 重试前的回调, on_retry(func, attempt, error, delay)
+        on_giveup: 放弃重试时的回调, on_giveup(func, attempt, error)
+        on_success: 调用成功时的回调, on_success(func, attempt, elapsed), elapsed为包含重试的总耗时
+    Returns:
+
+    """
+    policy = _RetryPolicy(tries, delay, backoff, max_delay, jitter, exceptions, policies, budget)
+
+    def _retry(func):
+        """
+        重试装饰器
+        """
+
+        @wraps(func)
+        async def _wrapper(*args, **kwargs):
+            if policy.budget is not None:
+                policy.budget.deposit()
+            start, attempt = time.monotonic(), 0
+            while True:
+                attempt += 1
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    next_delay = policy.next_delay(attempt, e)
+                    if next_delay is None:
+                        if on_giveup is not None:
+                            on_giveup(func, attempt, e)
+                        raise
+                    if on_retry is not None:
+                        on_retry(func, attempt, e, next_delay)
+                    await asyncio.sleep(next_delay)
+                else:
+                    if on_success is not None:
+                        on_success(func, attempt, time.monotonic() - start)
+                    return result
+
+        return _wrapper
+
+    return _retry
+
+
+def timeout(seconds: float, on_timeout: Optional[Callable] = None) -> Callable:
+    """
+    同步函数超时控制
+
+    函数在线程池中执行,调用方最多等待seconds秒;python无法中断正在执行的线程,超时后函数会在后台执行完成
+    Args:
+        seconds: 超时时间,单位秒
+        on_timeout: 超时时的回调, on_timeout(func, seconds)
+    Returns:
+
+    """
+
+    def _timeout(func):
+        """
+        超时装饰器
+        """
+
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            future = pool.submit(func, *args, **kwargs)
+            try:
+                return future.result(seconds)
+            except FutureTimeoutError:
+                future.cancel()
+                if on_timeout is not None:
+                    on_timeout(func, seconds)
+                raise FuncTimeoutError("{} timed out after {}s".format(getattr(func, "__name__", func), seconds))
+
+        return _wrapper
+
+    return _timeout
+
+
+def async_timeout(seconds: float, on_timeout: Optional[Callable] = None) -> Callable:
+    """
+    异步函数超时控制,超时后取消执行
+    Args:
+        seconds: 超时时间,单位秒
+        on_timeout: 超时时的回调, on_timeout(func, seconds)
+    Returns:
+
+    """
+
+    def _timeout(func):
+        """
+        超时装饰器
+        """
+
+        @wraps(func)
+        async def _wrapper(*args, **kwargs):
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), seconds)
+            except asyncio.TimeoutError:
+                if on_timeout is not None:
+                    on_timeout(func, seconds)
+                raise FuncTimeoutError("{} timed out after {}s".format(getattr(func, "__name__", func), seconds))
+
+        return _wrapper
+
+    return _timeout
+
+
+class CircuitBreaker(object):
+    """
+    熔断器
+
+    连续失败failure_threshold次后打开,打开期间直接抛出CircuitOpenError,不再调用下游也不占用线程池;
+    recovery_timeout秒后进入半开状态,放行half_open_max_calls个试探调用,成功则关闭,失败则重新打开;
+    调用被取消(包括asyncio.wait_for超时)、被隔离舱拒绝或者抛出exceptions之外的异常时不影响状态,只释放试探名额
+    eg:
+        order_breaker = CircuitBreaker("order", failure_threshold=5, recovery_timeout=30)
+        order_breaker.submit(func, *args, **kwargs)
+
+        @order_breaker
+        async def query_order(): ...
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30,
+                 half_open_max_calls: int = 1,
+                 exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]] = Exception,
+                 bulkhead: Optional[Bulkhead] = None, on_state_change: Optional[Callable] = None):
+        """
+            熔断器
+        Args:
+            name: 资源名称
+            failure_threshold: 连续失败多少次后打开
+            recovery_timeout: 打开多少秒后进入半开状态
+            half_open_max_calls: 半开状态下允许的试探调用数
+            exceptions: 计为失败的异常,其他异常不计为成功或者失败,不影响熔断器状态
+            bulkhead: 隔离舱,指定后submit提交的任务同时受隔离舱的并发数限制
+            on_state_change: 状态变化时的回调, on_state_change(breaker, old_state, new_state)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.exceptions = exceptions
+        self.bulkhead = bulkhead
+        self.on_state_change = on_state_change
+        self._lock = threading.RLock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._metrics: Dict[str, int] = {"calls": 0, "successes": 0, "failures": 0, "rejected": 0, "cancelled": 0,
+                                         "ignored": 0}
+        self._transitions: Dict[str, int] = {}
+
+    @property
+    def state(self) -> str:
+        """
+        熔断器当前状态
+        """
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """
+        熔断器的统计数据,transitions为各个状态变化的次数,eg: {"closed->open": 1}
+        """
+        with self._lock:
+            self._refresh_state()
+            return {**self._metrics, "state": self._state, "transitions": dict(self._transitions)}
+
+    def _set_state(self, state: str):
+        """
+        更改状态,需要在加锁后调用
+        """
+        old_state, self._state = self._state, state
+        transition = "{}->{}".format(old_state, state)
+        self._transitions[transition] = self._transitions.get(transition, 0) + 1
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        self._failures = self._half_open_calls = 0
+        if self.on_state_change is not None:
+            with ignore_error():
+                self.on_state_change(self, old_state, state)
+
+    def _refresh_state(self):
+        """
+        打开时间超过recovery_timeout后进入半开状态,需要在加锁后调用
+        """
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._set_state(self.HALF_OPEN)
+
+    def before_call(self):
+        """
+        调用前检查是否允许调用,不允许时抛出CircuitOpenError
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.OPEN or (
+                    self._state == self.HALF_OPEN and self._half_open_calls >= self.half_open_max_calls):
+                self._metrics["rejected"] += 1
+                raise CircuitOpenError("Circuit breaker {} is {}".format(self.name, self._state))
+            if self._state == self.HALF_OPEN:
+                self._half_open_calls += 1
+            self._metrics["calls"] += 1
+
+    def record_success(self):
+        """
+        记录调用成功
+        """
+        with self._lock:
+            self._metrics["successes"] += 1
+            if self._state == self.HALF_OPEN:
+                self._set_state(self.CLOSED)
+            else:
+                self._failures = 0
+
+    def _record_neutral(self, metric: str):
+        """
+        记录不计为成功或者失败的调用,只释放半开状态下的试探名额
+        """
+        with self._lock:
+            self._metrics[metric] += 1
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_cancel(self):
+        """
+        记录调用被取消、被隔离舱拒绝或者被SystemExit等中断,不计为成功或者失败,只释放半开状态下的试探名额
+        """
+        self._record_neutral("cancelled")
+
+    def record_failure(self, error: BaseException):
+        """
+        记录调用失败,不在exceptions中的异常不影响熔断器状态
+        """
+        # python3.8之前CancelledError是Exception的子类,需要单独判断
+        if isinstance(error, (asyncio.CancelledError, FutureCancelledError, BulkheadFullError)) or not isinstance(
+                error, Exception):
+            self.record_cancel()
+            return
+        if not isinstance(error, self.exceptions):
+            self._record_neutral("ignored")
+            return
+        with self._lock:
+            self._metrics["failures"] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._set_state(self.OPEN)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        在熔断器保护下调用同步函数
+        """
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    async def async_call(self, func: Callable, *args, **kwargs):
+        """
+        在熔断器保护下调用异步函数
+        """
+        self.before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:  # 包含超时或者取消时的CancelledError
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        在熔断器保护下提交任务到线程池,熔断器打开时直接抛出CircuitOpenError,不会占用线程池
+        Args:
+            func, *args, **kwargs
+        Returns:
+            concurrent.futures.Future
+        """
+        self.before_call()
+        try:
+            future = pool.submit(func, *args, **kwargs) if self.bulkhead is None else self.bulkhead.submit(
+                func, *args, **kwargs)
+        except BaseException as e:
+            self.record_failure(e)
+            raise
+
+        def _done(fn: Future):
+            if fn.cancelled():
+                self.record_cancel()
+                return
+            error = fn.exception()
+            if error is None:
+                self.record_success()
+            else:
+                self.record_failure(error)
+
+        future.add_done_callback(_done)
+        return future
+
+    def __call__(self, func: Callable) -> Callable:
+        """
+        装饰器形式,支持同步和异步函数
+        """
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                return await self.async_call(func, *args, **kwargs)
+
+            return _async_wrapper
+
+        @wraps(func)
+        def _wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+
+        return _wrapper
+
+
+class _PoolBridge(object):
+    """
+    线程池和事件循环之间的桥接
+
+    asyncio.wrap_future对每次调用都会在concurrent.futures.Future和asyncio.Future之间互相注册回调,
+    并且每个结果都单独调用一次call_soon_threadsafe唤醒事件循环。这里由工作线程直接把结果放入队列,
+    同一批完成的结果只唤醒一次事件循环,在事件循环中统一设置结果,异常类型保持不变。
+    只保存事件循环的弱引用,事件循环关闭并释放后对应的桥接对象也会被释放。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = weakref.ref(loop)
+        self._lock = threading.Lock()
+        self._completed: Deque[Tuple[asyncio.Future, Any, Optional[BaseException]]] = deque()
+        self._scheduled = False
+
+    def _complete(self, future: asyncio.Future, result: Any, error: Optional[BaseException]):
+        """
+        工作线程中调用,保存结果,如果事件循环还没有被唤醒则唤醒
+        """
+        with self._lock:
+            self._completed.append((future, result, error))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        loop = self._loop()
+        if loop is None:  # 事件循环已经被释放
+            return
+        try:
+            loop.call_soon_threadsafe(self._drain)
+        except RuntimeError:  # 事件循环已经关闭
+            pass
+
+    def _drain(self):
+        """
+        事件循环中调用,批量设置已完成任务的结果
+        """
+        with self._lock:
+            completed, self._completed = self._completed, deque()
+            self._scheduled = False
+        for future, result, error in completed:
+            if future.done():  # 已经被取消
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def submit(self, executor: Executor, func: Callable, args: Sequence, kwargs: MutableMapping) -> asyncio.Future:
+        """
+        提交任务到线程池
+        Args:
+            executor: 线程池
+            func: 要执行的函数
+            args: 函数参数
+            kwargs: 函数参数
+        Returns:
+            asyncio.Future
+        """
+        loop = self._loop()
+        if loop is None:
+            raise RuntimeError("Event loop is closed")
+        future = loop.create_future()
+
+        def _run():
+            if future.cancelled():
+                return
+            try:
+                result = func(*args, **kwargs)
+            except StopIteration as e:  # StopIteration不能设置到asyncio.Future中
+                error = RuntimeError("{!r} raised StopIteration".format(func))
+                error.__cause__ = e
+                self._complete(future, None, error)
+            except BaseException as e:  # SystemExit等也需要转交给等待的协程,否则会一直等待
+                self._complete(future, None, e)
+            else:
+                self._complete(future, result, None)
+
+        executor.submit(_run)
+        return future
+
+
+_pool_bridges: MutableMapping = weakref.WeakKeyDictionary()
+_pool_bridges_lock = threading.Lock()
+
+
+def _get_pool_bridge(loop: asyncio.AbstractEventLoop) -> _PoolBridge:
+    """
+    获取事件循环对应的桥接对象,每个事件循环一个
+    """
+    bridge = _pool_bridges.get(loop)
+    if bridge is None:
+        with _pool_bridges_lock:
+            bridge = _pool_bridges.get(loop)
+            if bridge is None:
+                bridge = _pool_bridges[loop] = _PoolBridge(loop)
+    return bridge
+
+
+def run_in_pool(func: Callable, *args, **kwargs) -> Awaitable:
+    """
+    在线程池中执行同步阻塞函数,返回可以await的对象
+
+    和wrap_async_func的区别是不会额外包装future,高并发调用时批量唤醒事件循环,并且原样抛出函数的异常
+    eg:
+        result = await run_in_pool(func, 1, b=2)
+    Args:
+        func: 实际请求的函数名或者方法名
+        args: 函数参数
+        kwargs: 函数参数
+    Returns:
+        asyncio.Future
+    """
+    return _get_pool_bridge(asyncio.get_event_loop()).submit(pool, func, args, kwargs)
+
+
+def _parse_funcs(funcs: Sequence) -> List[Tuple[Callable, Sequence, MutableMapping]]:
+    """
+    校验并解析批量传入的函数参数列表
     Args:
         funcs: 批量传入的参数列表,eg: [{"func":xx, "args":(), "kwargs":{}}, {"func":xx, "args":(), "kwargs":{}}]
     Returns:
-        返回执行后的结果，顺序和传入的顺序一致
+        [(func, args, kwargs), ...]
     """
-    tasks = []
-    for func in funcs:
-        func = func.get("func")
+    parsed_funcs: List[Tuple[Callable, Sequence, MutableMapping]] = []
+    for func_item in funcs:
+        func = func_item.get("func")
         if not (inspect.isfunction(func) or inspect.ismethod(func)):
             raise FuncArgsError("Function type error, error: func={}".format(func))
 
-        args = func.get("args")
-        if args and not isinstance(args, Sequence):
+        args = func_item.get("args") or ()
+        if not isinstance(args, Sequence):
             raise FuncArgsError("Args is not sequence type, func={}, args={}".format(func, args))
-        else:
-            args = ()
-
-        kwargs = func.get("kwargs")
-        if kwargs and not isinstance(kwargs, MutableMapping):
-            raise FuncArgsError("Kwargs is not MutableMapping type, func={}, args={}".format(func, args))
-        else:
-            kwargs = {}
-
-        tasks.append(asyncio.ensure_future(wrap_async_func(func, *args, **kwargs)))
-    dones, _ = await asyncio.wait(tasks)
-    return [task.result() for task in dones]
+
+        kwargs = func_item.get("kwargs") or {}
+        if not isinstance(kwargs, MutableMapping):
+            raise FuncArgsError("Kwargs is not MutableMapping type, func={}, kwargs={}".format(func, kwargs))
+
+        parsed_funcs.append((func, args, kwargs))
+    return parsed_funcs
+
+
+def _release_in_loop(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore):
+    """
+    线程池中的任务结束后在事件循环中释放信号量
+    """
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:  # 事件循环已经关闭
+        pass
+
+
+async def _iter_func_results(funcs: Sequence, concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                             return_exceptions: bool = False) -> AsyncGenerator[Tuple[int, Any], None]:
+    """
+    批量执行任务,按照完成的先后顺序返回结果
+
+    指定并发数时最多同时创建concurrency个task,一个完成后再创建下一个;信号量在线程池中的任务真正结束后才释放,
+    超时后线程池中的任务还会继续执行,这样超时的任务也会占用并发数,不会因为下游变慢而占满线程池
+    Args:
+        funcs: 批量传入的参数列表
+        concurrency: 最大并发数,默认不限制
+        timeout: 单个任务的超时时间,单位秒,默认不限制
+        return_exceptions: 是否把异常作为结果返回,否则遇到异常就直接抛出
+    Returns:
+        (index, result)
+    """
+    parsed_funcs = _parse_funcs(funcs)
+    if concurrency is not None and concurrency <= 0:
+        raise FuncArgsError("Concurrency must be a positive integer, concurrency={}".format(concurrency))
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    loop = asyncio.get_event_loop()
+
+    async def _run_func(index, func, args, kwargs):
+        """
+        在并发数限制内执行单个任务
+        """
+        try:
+            if semaphore is None:
+                result = await asyncio.wait_for(wrap_async_func(func, *args, **kwargs), timeout)
+            else:
+                await semaphore.acquire()
+                try:
+                    future = pool.submit(func, *args, **kwargs)
+                except Exception as e:
+                    semaphore.release()
+                    raise Error("Error: {}".format(e))
+                future.add_done_callback(lambda _: _release_in_loop(loop, semaphore))
+                result = await asyncio.wait_for(_wait_pool_future(future), timeout)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            result = e
+        return index, result
+
+    func_items = iter(enumerate(parsed_funcs))
+    pending: Set[asyncio.Future] = set()
+    try:
+        while True:
+            for index, func_args in func_items:
+                pending.add(asyncio.ensure_future(_run_func(index, *func_args)))
+                if concurrency and len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        _cancel_tasks(pending)
+
+
+def _cancel_tasks(tasks: Iterable[asyncio.Future]):
+    """
+    取消还没有执行完成的task,快速失败时使用,避免继续往线程池中提交任务
+    Args:
+        tasks: task列表
+    Returns:
+
+    """
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+async def wrap_async_funcs(funcs: Sequence, concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                           return_exceptions: bool = False) -> List:
+    """
+    批量包装同步方法为异步，批量执行
+    Args:
+        funcs: 批量传入的参数列表,eg: [{"func":xx, "args":(), "kwargs":{}}, {"func":xx, "args":(), "kwargs":{}}]
+        concurrency: 最大并发数,默认不限制,大批量任务时应该设置,避免占满线程池
+        timeout: 单个任务的超时时间,单位秒,超时后抛出asyncio.TimeoutError,默认不限制
+        return_exceptions: 为True时异常作为对应位置的结果返回;否则遇到第一个异常就取消剩余任务并抛出
+    Returns:
+        返回执行后的结果，顺序和传入的顺序一致
+    """
+    results: List[Any] = [None] * len(funcs)
+    async for index, result in _iter_func_results(funcs, concurrency, timeout, return_exceptions):
+        results[index] = result
+    return results
+
+
+async def iter_async_funcs(funcs: Sequence, concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                           return_exceptions: bool = False) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    批量包装同步方法为异步，批量执行，按照完成的先后顺序返回结果
+
+    eg:
+        async for index, result in iter_async_funcs(funcs, concurrency=10):
+            ...
+    Args:
+        funcs: 批量传入的参数列表,eg: [{"func":xx, "args":(), "kwargs":{}}, {"func":xx, "args":(), "kwargs":{}}]
+        concurrency: 最大并发数,默认不限制,大批量任务时应该设置,避免占满线程池
+        timeout: 单个任务的超时时间,单位秒,超时后抛出asyncio.TimeoutError,默认不限制
+        return_exceptions: 为True时异常作为结果返回;否则遇到第一个异常就取消剩余任务并抛出
+    Returns:
+        (index, result), index为传入时的位置
+    """
+    results = _iter_func_results(funcs, concurrency, timeout, return_exceptions)
+    try:
+        async for item in results:
+            yield item
+    finally:  # 提前退出循环时立即取消剩余任务
+        await results.aclose()
+
+
+if __name__ == '__main__':
+    async def _bench(name, bridge_func, count=20000):
+        start = time.perf_counter()
+        await asyncio.gather(*[bridge_func(abs, i) for i in range(count)])
+        elapsed = time.perf_counter() - start
+        print("{:<16} {:>10.0f} calls/s".format(name, count / elapsed))
+
+    async def _main():
+        for _ in range(2):
+            await _bench("wrap_async_func", wrap_async_func)
+            await _bench("run_in_executor", lambda func, *args: asyncio.get_event_loop().run_in_executor(
+                pool, func, *args))
+            await _bench("run_in_pool", run_in_pool)
+
+    asyncio.get_event_loop().run_until_complete(_main())
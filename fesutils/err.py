@@ -8,7 +8,8 @@
 """
 
 __all__ = ("Error", "EmailError", "ConfigError", "FuncArgsError", "QueryArgsError", "CommandArgsError",
-           "InvalidId", "HttpError")
+           "InvalidId", "HttpError", "FuncTimeoutError",
+           "CircuitOpenError", "BulkheadFullError", "NumberValueError")
 
 
 class Error(Exception):
@@ -67,6 +68,40 @@ class FuncArgsError(Error):
     pass
 
 
+class FuncTimeoutError(Error):
+    """
+    处理函数执行超时引发的error
+    """
+
+    pass
+
+
+class CircuitOpenError(Error):
+    """
+    处理熔断器打开时拒绝调用引发的error
+    """
+
+    pass
+
+
+class BulkheadFullError(Error):
+    """
+    处理隔离舱并发数已满时拒绝调用引发的error
+    """
+
+    pass
+
+
+class NumberValueError(Error):
+    """
+    处理批量转换数值时有无效值引发的error, indices为无效值的索引
+    """
+
+    def __init__(self, message=None, indices=None):
+        self.message = message
+        self.indices = indices or []
+
+
 class QueryArgsError(Error):
     """
     处理salalemy 拼接query错误
@@ -9,10 +9,14 @@
 
 from ._schemautils import *
 from ._fields import *
+from ._compiler import *
+from ._dumputils import *
 
 
 __all__ = (
     "sanic_schema_validate", "flask_schema_validate", "verify_schema", "schema2swagger", "gen_schema",
+    "verify_schema_iter", "compile_schema", "set_schema_error_log", "schema_error_stats",
+    "pregen_schemas", "schema2openapi", "dump_many", "iter_dump_json",
 
     "fields",
 )
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/18 下午2:20
+
+根据marshmallow的schema生成专用的校验函数
+
+对于String,Integer,Float,Boolean这些简单字段,常见类型的值直接在生成的函数中判断,
+其余的值和不支持的字段都交给字段本身的deserialize处理,所以错误消息和marshmallow完全一致;
+和marshmallow一样,Nested,List等字段校验失败时其中校验通过的部分也会放到ValidationError.valid_data中
+"""
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
+
+from marshmallow import EXCLUDE, Schema, ValidationError, fields
+from marshmallow.utils import is_collection, missing
+
+from ._schemautils import _get_schema_obj
+from ..cacheutils import LRU
+
+__all__ = ("compile_schema",)
+
+# 缓存生成的校验函数, key为(schema_cls, required, is_extends)
+_compiled_cache = LRU(max_size=1024)
+_compiled_lock = threading.Lock()
+
+
+def _load_default(field_obj: fields.Field) -> Any:
+    """
+    字段的默认值,兼容marshmallow 3.13之前的missing参数
+    """
+    return field_obj.load_default if hasattr(field_obj, "load_default") else field_obj.missing
+
+
+def _fast_check(field_obj: fields.Field) -> Union[str, None]:
+    """
+    生成字段常见类型值的快速判断表达式,不支持的字段返回None
+    Args:
+        field_obj: 字段对象
+    Returns:
+        表达式中v为字段的值,判断成立时v就是反序列化后的值
+    """
+    if field_obj.validators:
+        return None
+    if type(field_obj) is fields.String:
+        return "v.__class__ is str"
+    elif type(field_obj) is fields.Integer:
+        return "v.__class__ is int"
+    elif type(field_obj) is fields.Float:
+        # v - v == 0.0排除了nan和无穷大
+        return "v.__class__ is float" if field_obj.allow_nan else "v.__class__ is float and v - v == 0.0"
+    elif type(field_obj) is fields.Boolean:
+        if not field_obj.truthy or (True in field_obj.truthy and False in field_obj.falsy):
+            return "(v is True or v is False)"
+    return None
+
+
+def _gen_field_code(index: int, attr_name: str, field_obj: fields.Field, namespace: Dict) -> List[str]:
+    """
+    生成单个字段的校验代码
+    Args:
+        index: 字段的序号
+        attr_name: 字段名
+        field_obj: 字段对象
+        namespace: 生成函数的全局变量
+    Returns:
+        代码行
+    """
+    key, attr, field_var = "k{}".format(index), "a{}".format(index), "f{}".format(index)
+    namespace[key] = field_obj.data_key if field_obj.data_key is not None else attr_name
+    namespace[attr] = field_obj.attribute or attr_name
+    namespace[field_var] = field_obj
+    slow_path = [
+        "        try:",
+        "            result[{}] = {}.deserialize(v, {}, data)".format(attr, field_var, key),
+        "        except ValidationError as e:",
+        "            errors[{}] = e.messages".format(key),
+        "            if e.valid_data:",
+        "                result[{}] = e.valid_data".format(attr),
+    ]
+
+    fast_check = _fast_check(field_obj)
+    if fast_check is None:
+        return [
+            "    v = get({}, missing)".format(key),
+            "    try:",
+            "        v = {}.deserialize(v, {}, data)".format(field_var, key),
+            "    except ValidationError as e:",
+            "        errors[{}] = e.messages".format(key),
+            "        if e.valid_data:",
+            "            result[{}] = e.valid_data".format(attr),
+            "    else:",
+            "        if v is not missing:",
+            "            result[{}] = v".format(attr),
+        ]
+
+    lines = ["    v = get({}, missing)".format(key), "    if v is missing:"]
+    load_default = _load_default(field_obj)
+    if field_obj.required:
+        namespace["mr{}".format(index)] = field_obj.error_messages["required"]
+        lines.append("        errors[{}] = [mr{}]".format(key, index))
+    elif load_default is not missing:
+        namespace["d{}".format(index)] = load_default
+        lines.append("        result[{}] = d{}{}".format(attr, index, "()" if callable(load_default) else ""))
+    else:
+        lines.append("        pass")
+    lines.append("    elif v is None:")
+    if field_obj.allow_none:
+        lines.append("        result[{}] = None".format(attr))
+    else:
+        namespace["mn{}".format(index)] = field_obj.error_messages["null"]
+        lines.append("        errors[{}] = [mn{}]".format(key, index))
+    lines.extend(["    elif {}:".format(fast_check), "        result[{}] = v".format(attr), "    else:"])
+    lines.extend(slow_path)
+    return lines
+
+
+def _gen_loader(schema_obj: Schema) -> Callable:
+    """
+    生成校验函数
+    Args:
+        schema_obj: schema实例
+    Returns:
+        load(data, many=False), 校验失败时抛出ValidationError
+    """
+
+    def _load(data, many=False):
+        return schema_obj.load(data, many=many, unknown=EXCLUDE)
+
+    # 有钩子函数或者嵌套的attribute时直接使用marshmallow
+    if any(getattr(schema_obj, "_hooks", {}).values()) or any(
+            "." in (field_obj.attribute or "") for field_obj in schema_obj.load_fields.values()):
+        return _load
+
+    namespace = {"Mapping": Mapping, "ValidationError": ValidationError, "missing": missing,
+                 "dict_class": schema_obj.dict_class, "type_msg": schema_obj.error_messages["type"]}
+    lines = [
+        "def load_one(data):",
+        "    if not isinstance(data, Mapping):",
+        "        raise ValidationError({'_schema': [type_msg]}, data=data, valid_data=dict_class())",
+        "    result = dict_class()",
+        "    errors = {}",
+        "    get = data.get",
+    ]
+    for index, (attr_name, field_obj) in enumerate(schema_obj.load_fields.items()):
+        lines.extend(_gen_field_code(index, attr_name, field_obj, namespace))
+    lines.extend([
+        "    if errors:",
+        "        raise ValidationError(errors, data=data, valid_data=result)",
+        "    return result",
+    ])
+    exec(compile("\n".join(lines), "<compiled {}>".format(type(schema_obj).__name__), "exec"), namespace)
+    load_one = namespace["load_one"]
+    index_errors = schema_obj.opts.index_errors
+
+    def _load_many(data):
+        if not is_collection(data):
+            raise ValidationError({"_schema": [schema_obj.error_messages["type"]]}, data=data, valid_data=[])
+        results, errors = [], {}
+        for index, item in enumerate(data):
+            try:
+                results.append(load_one(item))
+            except ValidationError as e:
+                errors[index] = e.messages
+                results.append(e.valid_data)
+        if errors:
+            raise ValidationError(errors, data=data, valid_data=results)
+        return results
+
+    def _compiled_load(data, many=False):
+        if not many:
+            return load_one(data)
+        # 不需要索引的错误消息需要合并,交给marshmallow处理
+        return _load_many(data) if index_errors else _load(data, many=True)
+
+    return _compiled_load
+
+
+def compile_schema(schema_cls: Type[Schema], required: Union[Tuple, List] = tuple(),
+                   is_extends: bool = True) -> Callable:
+    """
+    根据schema生成专用的校验函数,校验结果和错误消息与verify_schema中的load一致,未知字段被排除
+
+    生成的函数会被缓存,同样的参数只生成一次
+    eg:
+        load = compile_schema(UserSchema)
+        valid_data = load(json_data)
+        valid_list = load(json_list, many=True)
+    Args:
+        schema_cls: 定义的schema对象
+        required: 需要标记require的字段
+        is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
+    Returns:
+        load(data, many=False), 校验失败时抛出marshmallow.ValidationError
+    """
+    key = (schema_cls, tuple(required), is_extends)
+    loader = _compiled_cache.get(key)
+    if loader is None:
+        with _compiled_lock:
+            loader = _compiled_cache.get(key)
+            if loader is None:
+                loader = _compiled_cache[key] = _gen_loader(_get_schema_obj(schema_cls, required, is_extends))
+    return loader
+
+
+if __name__ == '__main__':
+    import timeit
+
+    from ._schemautils import verify_schema
+
+    class _BenchSchema(Schema):
+        id = fields.Integer(required=True)
+        name = fields.String(required=True)
+        email = fields.String()
+        score = fields.Float()
+        level = fields.Integer(load_default=1)
+        enabled = fields.Boolean()
+        remark = fields.String(allow_none=True)
+
+    _bench_data = {"id": 1, "name": "fesutils", "email": "a@b.c", "score": 99.5, "enabled": True,
+                   "remark": None, "unknown": "x"}
+    _compiled_load = compile_schema(_BenchSchema)
+    assert _compiled_load(_bench_data) == verify_schema(_BenchSchema, _bench_data)
+
+    class _ItemSchema(Schema):
+        sku = fields.String(required=True)
+        count = fields.Integer()
+
+    class _OrderSchema(_BenchSchema):
+        item = fields.Nested(_ItemSchema)
+        tags = fields.List(fields.Integer())
+
+    # 校验失败时错误消息和valid_data都和marshmallow一致
+    _error_data = {"id": "x", "name": "fesutils", "score": "bad", "item": {"sku": "a", "count": "x"},
+                   "tags": [1, "x", 3]}
+    for _many in (False, True):
+        _errors = []
+        for _load in (compile_schema(_OrderSchema),
+                      lambda data, many=False: _OrderSchema().load(data, many=many, unknown=EXCLUDE)):
+            try:
+                _load([_error_data, _bench_data] if _many else _error_data, many=_many)
+            except ValidationError as e:
+                _errors.append((e.messages, e.valid_data))
+        assert len(_errors) == 2 and _errors[0] == _errors[1], _errors
+
+    for _name, _func in (("verify_schema", lambda: verify_schema(_BenchSchema, _bench_data)),
+                         ("compile_schema", lambda: _compiled_load(_bench_data))):
+        _number = 50000
+        _elapsed = min(timeit.repeat(_func, number=_number, repeat=3))
+        print("{:<16} {:>10.0f} loads/s".format(_name, _number / _elapsed))
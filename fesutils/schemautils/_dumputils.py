@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/18 下午7:40
+
+根据marshmallow的schema批量序列化数据,主要用于返回大量ORM数据的接口
+
+每个schema只生成一次字段的取值和序列化计划,String,Integer,Float,Boolean这些简单字段的常见类型值直接输出,
+其余的值交给字段本身的_serialize处理,所以结果和marshmallow的dump完全一致
+"""
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from marshmallow import Schema, fields
+from marshmallow.utils import get_value, missing
+
+from .._containerutils import chunked_iter
+from .._jsonutils import json_dumps
+from ..cacheutils import LRU
+
+__all__ = ("dump_many", "iter_dump_json")
+
+# 缓存生成的序列化函数, key为(schema_cls, only, exclude)
+_dumper_cache = LRU(max_size=1024)
+_dumper_lock = threading.Lock()
+
+
+def _dump_default(field_obj: fields.Field) -> Any:
+    """
+    字段序列化的默认值,兼容marshmallow 3.13之前的default参数
+    """
+    return field_obj.dump_default if hasattr(field_obj, "dump_default") else field_obj.default
+
+
+def _fast_types(field_obj: fields.Field) -> Tuple[type, ...]:
+    """
+    字段的值是这些类型时,序列化后的值就是原值
+    Args:
+        field_obj: 字段对象
+    Returns:
+        不支持的字段返回空元祖
+    """
+    if type(field_obj) is fields.String:
+        return str, type(None)
+    elif (type(field_obj) is fields.Integer or type(field_obj) is fields.Float) and not field_obj.as_string:
+        return field_obj.num_type, type(None)
+    elif type(field_obj) is fields.Boolean and True in field_obj.truthy and False in field_obj.falsy:
+        return bool, type(None)
+    elif type(field_obj) is fields.Raw:
+        return str, int, float, bool, type(None)
+    return ()
+
+
+def _gen_dumper(schema_obj: Schema) -> Callable[[Any], Dict]:
+    """
+    生成单条数据的序列化函数
+    Args:
+        schema_obj: schema实例
+    Returns:
+        dump_one(obj)
+    """
+    # 有钩子函数、嵌套的attribute或者自定义了get_attribute时直接使用marshmallow
+    if any(getattr(schema_obj, "_hooks", {}).values()) or type(schema_obj).get_attribute is not Schema.get_attribute:
+        return lambda obj: schema_obj.dump(obj)
+    if any("." in (field_obj.attribute or attr_name) for attr_name, field_obj in schema_obj.dump_fields.items()):
+        return lambda obj: schema_obj.dump(obj)
+
+    dict_class = schema_obj.dict_class
+    get_attribute = schema_obj.get_attribute
+    # (输出的key, 字段名, 取值的属性名, 字段对象, 默认值, 默认值是否可调用, 原样输出的类型)
+    # Method, Function等不需要取值的字段属性名为None
+    plan: List[Tuple[str, str, Optional[str], fields.Field, Any, bool, Tuple[type, ...]]] = []
+    for attr_name, field_obj in schema_obj.dump_fields.items():
+        key = field_obj.data_key if field_obj.data_key is not None else attr_name
+        if not field_obj._CHECK_ATTRIBUTE:
+            plan.append((key, attr_name, None, field_obj, missing, False, ()))
+            continue
+        default = _dump_default(field_obj)
+        plan.append((key, attr_name, field_obj.attribute or attr_name, field_obj, default, callable(default),
+                     _fast_types(field_obj)))
+
+    def dump_one(obj: Any) -> Dict:
+        result = dict_class()
+        # 和marshmallow.utils.get_value的取值顺序一致,字典中没有时再取属性
+        get = obj.get if obj.__class__ is dict else None
+        by_item = get is None and hasattr(obj, "__getitem__")
+        for key, attr_name, attr, field_obj, default, call_default, fast_types in plan:
+            if attr is None:
+                value = field_obj.serialize(attr_name, obj, accessor=get_attribute)
+                if value is not missing:
+                    result[key] = value
+                continue
+            if get is not None:
+                value = get(attr, missing)
+                if value is missing:
+                    value = getattr(obj, attr, missing)
+            elif by_item:
+                value = get_value(obj, attr, missing)
+            else:
+                value = getattr(obj, attr, missing)
+            if value is missing:
+                if default is missing:
+                    continue
+                value = default() if call_default else default
+            if value.__class__ in fast_types:
+                result[key] = value
+            else:
+                result[key] = field_obj._serialize(value, attr_name, obj)
+        return result
+
+    return dump_one
+
+
+def _get_dumper(schema_cls: Type[Schema], only: Optional[Union[Tuple, List]] = None,
+                exclude: Union[Tuple, List] = tuple()) -> Callable[[Any], Dict]:
+    """
+    获取缓存的单条数据序列化函数
+    """
+    key = (schema_cls, None if only is None else tuple(only), tuple(exclude))
+    dumper = _dumper_cache.get(key)
+    if dumper is None:
+        with _dumper_lock:
+            dumper = _dumper_cache.get(key)
+            if dumper is None:
+                dumper = _dumper_cache[key] = _gen_dumper(schema_cls(only=key[1], exclude=key[2]))
+    return dumper
+
+
+def dump_many(schema_cls: Type[Schema], objs: Iterable[Any], only: Optional[Union[Tuple, List]] = None,
+              exclude: Union[Tuple, List] = tuple()) -> List[Dict]:
+    """
+    批量序列化数据,结果和schema_cls(only=only, exclude=exclude).dump(objs, many=True)一致
+
+    每个schema只生成一次序列化函数,之后直接复用
+    eg:
+        return json(dump_many(UserSchema, users, exclude=("password",)))
+    Args:
+        schema_cls: 定义的schema对象
+        objs: 要序列化的数据,ORM对象或者字典
+        only: 只输出的字段
+        exclude: 排除不需要的字段
+    Returns:
+        序列化后的字典列表
+    """
+    dump_one = _get_dumper(schema_cls, only, exclude)
+    return [dump_one(obj) for obj in objs]
+
+
+def iter_dump_json(schema_cls: Type[Schema], objs: Iterable[Any], only: Optional[Union[Tuple, List]] = None,
+                   exclude: Union[Tuple, List] = tuple(), batch_size: int = 500) -> Iterator[bytes]:
+    """
+    分批序列化数据并输出json数组的片段,用于流式返回大量数据,不需要一次性在内存中生成整个列表
+    eg:
+        async def handler(request):
+            response = await request.respond(content_type="application/json")
+            for chunk in iter_dump_json(UserSchema, users):
+                await response.send(chunk)
+            await response.eof()
+    Args:
+        schema_cls: 定义的schema对象
+        objs: 要序列化的数据,可以是列表或者生成器
+        only: 只输出的字段
+        exclude: 排除不需要的字段
+        batch_size: 每批序列化的数据条数,每批输出一个片段
+    Returns:
+        utf-8编码的json片段,所有片段拼接起来是一个json数组
+    """
+    dump_one = _get_dumper(schema_cls, only, exclude)
+    separator = b"["
+    for batch in chunked_iter(objs, batch_size):
+        # 序列化整批数据后去掉两边的中括号
+        yield separator + json_dumps([dump_one(obj) for obj in batch])[1:-1]
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+if __name__ == '__main__':
+    import timeit
+
+    class _Row(object):
+        def __init__(self, index):
+            self.id = index
+            self.name = "user-{}".format(index)
+            self.email = "user-{}@example.com".format(index)
+            self.score = index * 1.5
+            self.enabled = index % 2 == 0
+            self.remark = None
+
+    class _RowSchema(Schema):
+        id = fields.Integer()
+        name = fields.String()
+        email = fields.String()
+        score = fields.Float()
+        enabled = fields.Boolean()
+        remark = fields.String(allow_none=True)
+        level = fields.Integer(dump_default=1)
+
+    _rows = [_Row(i) for i in range(5000)]
+    _schema = _RowSchema()
+    assert dump_many(_RowSchema, _rows) == _schema.dump(_rows, many=True)
+    assert dump_many(_RowSchema, [vars(row) for row in _rows]) == _schema.dump([vars(row) for row in _rows], many=True)
+
+    for _name, _func in (("schema.dump", lambda: _schema.dump(_rows, many=True)),
+                         ("dump_many", lambda: dump_many(_RowSchema, _rows)),
+                         ("iter_dump_json", lambda: b"".join(iter_dump_json(_RowSchema, _rows)))):
+        _elapsed = min(timeit.repeat(_func, number=5, repeat=3)) / 5
+        print("{:<16} {:>8.2f}ms".format(_name, _elapsed * 1e3))
@@ -9,18 +9,152 @@
 schema校验，需要安装flask或者sanic
 """
 import copy
-from collections import MutableMapping, MutableSequence
+import itertools
+import threading
+import time
+import weakref
+from collections import MutableMapping, MutableSequence, deque
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future
 from functools import wraps
-from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union, cast
 
 import aelog
-from marshmallow import EXCLUDE, Schema, ValidationError, fields
+from marshmallow import EXCLUDE, Schema, ValidationError, class_registry, fields
 
+from .._containerutils import chunked_iter
 from .._err_msg import schema_msg
+from .._jsonutils import json_loads
+from .._limitutils import RateLimiter
 from .._strutils import under2camel
+from .._wraputils import run_in_pool
+from ..cacheutils import LRU
 from ..err import FuncArgsError, HttpError
 
-__all__ = ("sanic_schema_validate", "flask_schema_validate", "verify_schema", "schema2swagger", "gen_schema")
+__all__ = ("sanic_schema_validate", "flask_schema_validate", "verify_schema", "schema2swagger", "gen_schema",
+           "verify_schema_iter", "set_schema_error_log", "schema_error_stats",
+           "pregen_schemas", "schema2openapi")
+
+
+class _SchemaErrorLog(object):
+    """
+    校验失败的日志和统计
+
+    客户端提交错误的数据是预期内的错误,不记录堆栈;日志按照限流器采样输出,丢弃的日志数在下一条日志中输出,
+    按照schema和字段统计错误次数
+    """
+
+    def __init__(self, rate: float = 10, capacity: int = 10):
+        self.limiter = RateLimiter(rate, capacity)
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], int] = {}
+        self._suppressed = 0
+
+    @staticmethod
+    def _iter_fields(messages: Union[Dict, List]):
+        """
+        错误消息中的字段名,批量校验时错误消息的key为索引
+        """
+        if not isinstance(messages, dict):
+            yield "_schema"
+            return
+        for key, val in messages.items():
+            if isinstance(key, int):
+                yield from _SchemaErrorLog._iter_fields(val)
+            else:
+                yield key
+
+    def record(self, schema_cls: Type[Schema], messages: Union[Dict, List]):
+        """
+        记录一次校验失败
+        Args:
+            schema_cls: 定义的schema对象
+            messages: 错误消息
+        Returns:
+
+        """
+        schema_name = schema_cls.__name__
+        with self._lock:
+            for field_name in self._iter_fields(messages):
+                key = (schema_name, field_name)
+                self._stats[key] = self._stats.get(key, 0) + 1
+            if not self.limiter.try_acquire():
+                self._suppressed += 1
+                return
+            suppressed, self._suppressed = self._suppressed, 0
+        aelog.warning('Request body validation error, please check! schema={}, suppressed={}, error={}'.format(
+            schema_name, suppressed, messages))
+
+    def stats(self, reset: bool = False) -> Dict[Tuple[str, str], int]:
+        """
+        按照(schema名称, 字段名)统计的错误次数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            if reset:
+                self._stats.clear()
+        return stats
+
+
+_schema_error_log = _SchemaErrorLog()
+
+
+def set_schema_error_log(rate: float, capacity: int = 10):
+    """
+    设置校验失败日志的采样速率
+    Args:
+        rate: 每秒最多输出的日志条数
+        capacity: 允许突发输出的日志条数,默认和模块默认的采样配置一致
+    Returns:
+
+    """
+    _schema_error_log.limiter = RateLimiter(rate, capacity)
+
+
+def schema_error_stats(reset: bool = False) -> Dict[Tuple[str, str], int]:
+    """
+    获取校验失败的统计数据
+    Args:
+        reset: 获取后是否清空统计数据
+    Returns:
+        {(schema名称, 字段名): 错误次数}
+    """
+    return _schema_error_log.stats(reset)
+
+
+# schema2swagger和schema2openapi的结果缓存, key为(schema_cls, excluded, require_only)
+_swagger_cache = LRU(max_size=1024)
+_openapi_cache = LRU(max_size=1024)
+# schema类在components中的名称,类名重复时需要区分
+_openapi_names: MutableMapping = weakref.WeakKeyDictionary()
+_openapi_name_classes: MutableMapping = weakref.WeakValueDictionary()
+_openapi_names_lock = threading.Lock()
+
+# 字段到OpenAPI类型的映射,子类需要在父类之前
+_OPENAPI_FIELD_MAP = (
+    (fields.Email, {"type": "string", "format": "email"}),
+    (fields.Url, {"type": "string", "format": "uri"}),
+    (fields.UUID, {"type": "string", "format": "uuid"}),
+    (fields.String, {"type": "string"}),
+    (fields.Integer, {"type": "integer"}),
+    (fields.Number, {"type": "number"}),
+    (fields.Boolean, {"type": "boolean"}),
+    (fields.Date, {"type": "string", "format": "date"}),
+    (fields.Time, {"type": "string"}),
+    (fields.DateTime, {"type": "string", "format": "date-time"}),
+)
+
+# 部分更新时的字段查找表, key为(schema_cls, required, is_extends, excluded)
+_partial_fields_cache = LRU(max_size=1024)
+
+# gen_schema生成的schema类的最大缓存数量
+GEN_SCHEMA_CACHE_SIZE = 4096
+_gen_schema_cache = LRU(max_size=GEN_SCHEMA_CACHE_SIZE)
+_gen_schema_locks = [threading.Lock() for _ in range(64)]
+
+# 缓存校验用的schema实例, key为(schema_cls, required, is_extends)
+_schema_obj_cache = LRU(max_size=1024)
+_schema_obj_lock = threading.Lock()
 
 
 def _verify_message(src_message: Dict, message: Union[List, Dict]) -> Dict:
@@ -43,11 +177,116 @@ def _verify_message(src_message: Dict, message: Union[List, Dict]) -> Dict:
     return src_message
 
 
+def _gen_schema_obj(schema_cls: Type[Schema], required: Tuple, is_extends: bool) -> Schema:
+    """
+    生成校验用的schema实例,并且按照required和is_extends更改字段属性
+    Args:
+        schema_cls: 定义的schema对象
+        required: 需要标记require的字段
+        is_extends: 是否继承schemea本身其他字段的require属性
+    Returns:
+
+    """
+    schema_obj = schema_cls(unknown=EXCLUDE)
+    if required:
+        for key, val in schema_obj.fields.items():
+            if key in required:  # 反序列化期间，把特别需要的字段标记为required
+                setattr(schema_obj.fields[key], "dump_only", False)
+                schema_obj.load_fields[key] = schema_obj.fields[key]
+            elif not is_extends:
+                setattr(schema_obj.fields[key], "required", False)
+    return schema_obj
+
+
+def _get_schema_obj(schema_cls: Type[Schema], required: Union[Tuple, List] = tuple(),
+                    is_extends: bool = True) -> Schema:
+    """
+    获取缓存的schema实例
+
+    schema实例化时会深拷贝所有的字段,所以同样参数的实例只生成一次,之后的校验复用该实例。
+    生成后的实例不会再被修改,load过程中也不会修改实例的状态,所以多线程和协程中共用是安全的。
+    Args:
+        schema_cls: 定义的schema对象
+        required: 需要标记require的字段
+        is_extends: 是否继承schemea本身其他字段的require属性
+    Returns:
+
+    """
+    key = (schema_cls, tuple(required), is_extends)
+    schema_obj = _schema_obj_cache.get(key)
+    if schema_obj is None:
+        with _schema_obj_lock:
+            schema_obj = _schema_obj_cache.get(key)
+            if schema_obj is None:
+                schema_obj = _schema_obj_cache[key] = _gen_schema_obj(schema_cls, key[1], is_extends)
+    return schema_obj
+
+
+def _get_partial_fields(schema_cls: Type[Schema], required: Tuple, is_extends: bool,
+                        excluded: Tuple) -> Optional[Dict[str, Tuple[str, fields.Field]]]:
+    """
+    获取部分更新时使用的字段查找表,排除的字段不在查找表中
+
+    schema有钩子函数或者嵌套的attribute时返回None,这时使用marshmallow的partial处理
+    Args:
+        schema_cls: 定义的schema对象
+        required: 需要标记require的字段
+        is_extends: 是否继承schemea本身其他字段的require属性
+        excluded: 排除不需要的字段
+    Returns:
+        {data_key: (attribute, field)}
+    """
+    key = (schema_cls, required, is_extends, excluded)
+    try:
+        return _partial_fields_cache[key]
+    except KeyError:
+        pass
+    schema_obj = _get_schema_obj(schema_cls, required, is_extends)
+    partial_fields: Optional[Dict[str, Tuple[str, fields.Field]]] = None
+    if not any(getattr(schema_obj, "_hooks", {}).values()) and not any(
+            "." in (field_obj.attribute or attr_name) for attr_name, field_obj in schema_obj.load_fields.items()):
+        partial_fields = {}
+        for attr_name, field_obj in schema_obj.load_fields.items():
+            if attr_name not in excluded:
+                data_key = field_obj.data_key if field_obj.data_key is not None else attr_name
+                partial_fields[data_key] = (field_obj.attribute or attr_name, field_obj)
+    _partial_fields_cache[key] = partial_fields
+    return partial_fields
+
+
+def _partial_load(schema_obj: Schema, partial_fields: Dict[str, Tuple[str, fields.Field]], json_data: Dict,
+                  required: Tuple) -> Dict:
+    """
+    部分更新时只校验提交的字段,required中的字段仍然必须提交
+    """
+    valid_data = schema_obj.dict_class()
+    errors: Dict[str, Any] = {}
+    for attr_name in required:
+        field_obj = schema_obj.load_fields.get(attr_name)
+        if field_obj is not None:
+            data_key = field_obj.data_key if field_obj.data_key is not None else attr_name
+            if data_key not in json_data:
+                errors[data_key] = [field_obj.error_messages["required"]]
+    for data_key, value in json_data.items():
+        field_info = partial_fields.get(data_key)
+        if field_info is None:  # 未知的字段和排除的字段
+            continue
+        attribute, field_obj = field_info
+        try:
+            valid_data[attribute] = field_obj.deserialize(value, data_key, json_data, partial=True)
+        except ValidationError as err:
+            errors[data_key] = err.messages
+    if errors:
+        raise ValidationError(errors, data=json_data, valid_data=valid_data)
+    return valid_data
+
+
 def verify_schema(schema_cls, json_data: Union[List[Dict], Dict],
                   required: Union[Tuple, List] = tuple(),
                   excluded: Union[Tuple, List] = tuple(),
                   is_extends: bool = True,
-                  message: Dict = None) -> Union[List[Dict], Dict]:
+                  message: Dict = None,
+                  partial: bool = False) -> Union[List[Dict], Dict]:
     """
     校验post的json格式和类型是否正确
 
@@ -59,26 +298,30 @@ def verify_schema(schema_cls, json_data: Union[List[Dict], Dict],
         excluded: 排除不需要的字段
         is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
         message: 提示消息
+        partial: 是否部分更新,为True时只校验提交的字段,没有提交的字段即使是必需的也不校验,
+                 但是required中指定的字段仍然必须提交,主要用于PATCH请求;
+                 部分更新时排除的字段和未知字段直接跳过不校验,而非部分更新时排除的字段会先校验再过滤掉
     Returns:
     """
 
-    schema_obj = schema_cls(unknown=EXCLUDE)
-    if required:
-        for key, val in schema_obj.fields.items():
-            if key in required:  # 反序列化期间，把特别需要的字段标记为required
-                setattr(schema_obj.fields[key], "dump_only", False)
-                schema_obj.load_fields[key] = schema_obj.fields[key]
-            elif not is_extends:
-                setattr(schema_obj.fields[key], "required", False)
+    schema_obj = _get_schema_obj(schema_cls, required, is_extends)
     try:
-        valid_data = schema_obj.load(json_data, unknown=EXCLUDE)
+        if partial:
+            partial_fields = _get_partial_fields(schema_cls, tuple(required), is_extends, tuple(excluded))
+            if partial_fields is not None and isinstance(json_data, Mapping):
+                return _partial_load(schema_obj, partial_fields, json_data, tuple(required))
+            # 除了required中的字段,其他字段都可以不提交
+            partial_names = tuple(name for name in schema_obj.load_fields if name not in required) if required else True
+            valid_data = schema_obj.load(json_data, unknown=EXCLUDE, partial=partial_names)
+        else:
+            valid_data = schema_obj.load(json_data, unknown=EXCLUDE)
         # 把load后不需要的字段过滤掉，主要用于不允许修改的字段load后过滤掉
         if excluded and isinstance(valid_data, dict):
             for val in excluded:
                 valid_data.pop(val, None)
     except ValidationError as err:
         message = schema_msg if message is None else message
-        aelog.exception('Request body validation error, please check! error={}'.format(err.messages))
+        _schema_error_log.record(schema_cls, err.messages)
         raise HttpError(400, message=message[201]["msg_zh"], error=err.messages)
     except Exception as err:
         message = schema_msg if message is None else message
@@ -88,9 +331,119 @@ def verify_schema(schema_cls, json_data: Union[List[Dict], Dict],
         return valid_data
 
 
+def _verify_chunk(schema_cls: Type[Schema], required: Tuple, excluded: Tuple, is_extends: bool,
+                  start: int, chunk: List[Dict]) -> Tuple[List[Dict], Dict[int, Any]]:
+    """
+    校验一批数据,可以在线程池或者进程池中执行
+    Args:
+        schema_cls: 定义的schema对象
+        required: 需要标记require的字段
+        excluded: 排除不需要的字段
+        is_extends: 是否继承schemea本身其他字段的require属性
+        start: 这批数据中第一条数据的索引
+        chunk: 这批数据
+    Returns:
+        (校验通过的数据, {索引: 错误消息})
+    """
+    schema_obj = _get_schema_obj(schema_cls, required, is_extends)
+    valid_records: List[Dict] = []
+    errors: Dict[int, Any] = {}
+    for index, record in enumerate(chunk, start):
+        try:
+            valid_data = schema_obj.load(record, unknown=EXCLUDE)
+        except ValidationError as err:
+            errors[index] = err.messages
+        else:
+            if excluded and isinstance(valid_data, dict):
+                for val in excluded:
+                    valid_data.pop(val, None)
+            valid_records.append(valid_data)
+    return valid_records, errors
+
+
+def verify_schema_iter(schema_cls: Type[Schema], records: Iterable[Dict],
+                       required: Union[Tuple, List] = tuple(),
+                       excluded: Union[Tuple, List] = tuple(),
+                       is_extends: bool = True,
+                       message: Optional[Dict] = None,
+                       chunk_size: int = 1000,
+                       max_errors: int = 100,
+                       errors: Optional[Dict[int, Dict]] = None,
+                       executor: Optional[Executor] = None,
+                       prefetch: int = 4) -> Iterator[Dict]:
+    """
+    分批流式校验大量数据,逐条返回校验通过的数据
+
+    主要用于批量导入等数据量很大的场景,不需要一次性在内存中保存所有的校验结果,单条数据错误也不影响其他数据
+    eg:
+        errors = {}
+        for valid_data in verify_schema_iter(UserSchema, rows, errors=errors, executor=pool):
+            ...
+    Args:
+        schema_cls: 定义的schema对象
+        records: 要校验的数据,可以是列表或者生成器
+        required: 需要标记require的字段
+        excluded: 排除不需要的字段
+        is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
+        message: 提示消息
+        chunk_size: 每批校验的数据条数
+        max_errors: 最多收集的错误数,超过后不再校验,抛出HttpError
+        errors: 收集错误消息的字典,{索引: 错误消息};不指定时如果有错误,迭代结束后抛出HttpError
+        executor: 执行校验的线程池或者进程池,默认在当前线程中执行;使用进程池时schema_cls需要能被pickle
+        prefetch: 使用executor时最多同时提交的批次数
+    Returns:
+        校验通过的数据
+    """
+    raise_errors = errors is None
+    errors = {} if errors is None else errors
+    message = schema_msg if message is None else message
+    args = (schema_cls, tuple(required), tuple(excluded), is_extends)
+
+    def _iter_chunks():
+        start = 0
+        for chunk in chunked_iter(records, chunk_size):
+            yield start, chunk
+            start += len(chunk)
+
+    def _iter_results():
+        if executor is None:
+            for start, chunk in _iter_chunks():
+                yield _verify_chunk(*args, start, chunk)
+            return
+        pending: Deque[Future] = deque()
+        try:
+            for start, chunk in _iter_chunks():
+                pending.append(executor.submit(_verify_chunk, *args, start, chunk))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    for valid_records, chunk_errors in _iter_results():
+        yield from valid_records
+        if chunk_errors:
+            _schema_error_log.record(schema_cls, chunk_errors)
+            # 只合并剩余数量的错误,errors中最多有max_errors个错误
+            remaining = max(max_errors - len(errors), 0)
+            if len(chunk_errors) > remaining:
+                chunk_errors = dict(itertools.islice(chunk_errors.items(), remaining))
+            errors.update(chunk_errors)
+            if len(errors) >= max_errors:
+                raise HttpError(400, message=message[201]["msg_zh"],
+                                error=dict(itertools.islice(errors.items(), max_errors)))
+    if raise_errors and errors:
+        raise HttpError(400, message=message[201]["msg_zh"], error=errors)
+
+
 def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = tuple(),
                       is_extends: bool = True, excluded: Union[Tuple, List] = tuple(),
-                      is_async: bool = True, message: Dict = None) -> Callable:
+                      is_async: bool = True, message: Dict = None,
+                      offload_size: Optional[int] = None, on_validated: Optional[Callable] = None,
+                      from_body: bool = False, partial: bool = False,
+                      on_invalid: Optional[Callable] = None) -> Callable:
     """
     校验post的json格式和类型是否正确
     Args:
@@ -100,6 +453,11 @@ def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = t
         is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
         message: 提示消息
         is_async: 是否异步库,用于区分sanic和flask,默认sanic异步框架
+        offload_size: 异步框架中请求body的字节数超过该值时,在线程池中解析和校验,避免阻塞事件循环,None表示不启用
+        on_validated: 校验完成后的回调, on_validated(schema_cls, elapsed, offloaded), elapsed为校验耗时,单位秒
+        from_body: 是否直接使用json_loads解析请求body,不经过框架的json解析
+        partial: 是否部分更新,为True时只校验提交的字段
+        on_invalid: 校验失败时的回调, on_invalid(schema_cls, elapsed, offloaded, error), error为抛出的异常
     Returns:
     """
     if is_async is True:
@@ -123,7 +481,21 @@ def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = t
     # 此处的功能保证，如果调用了多个校验装饰器，则其中一个更改了，所有的都会更改
     if not getattr(_schema_validated, "message", None):
         setattr(_schema_validated, "message", _verify_message(schema_msg, message or {}))
-    schema_message = getattr(_schema_validated, "message", None)
+    schema_message: Dict = getattr(_schema_validated, "message")
+
+    def _request_json(request_json: Callable, request_body: Callable):
+        """
+        获取请求的json数据
+        """
+        if not from_body:
+            return request_json()
+        body = request_body()
+        if not body:
+            return None
+        try:
+            return json_loads(body)
+        except ValueError as err:
+            raise HttpError(400, message=schema_message[201]["msg_zh"], error="Invalid JSON body: {}".format(err))
 
     def _validated(func):
         """
@@ -136,7 +508,24 @@ def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = t
             校验post的json格式和类型是否正确
             """
             request_ = args[0] if isinstance(args[0], Request) else args[1]
-            request_.ctx.json = verify_schema(schema_cls, request_.json, required, excluded, is_extends, schema_message)
+            start = time.perf_counter()
+            offloaded = offload_size is not None and len(request_.body or b"") > offload_size
+            try:
+                if offloaded:  # request.json是延迟解析的,大的body解析json也放到线程池中
+                    request_.ctx.json = await run_in_pool(lambda: verify_schema(
+                        schema_cls, _request_json(lambda: request_.json, lambda: request_.body),
+                        required, excluded, is_extends, schema_message, partial))
+                else:
+                    request_.ctx.json = verify_schema(
+                        schema_cls, _request_json(lambda: request_.json, lambda: request_.body),
+                        required, excluded, is_extends, schema_message, partial)
+            except Exception as e:
+                if on_invalid is not None:
+                    on_invalid(schema_cls, time.perf_counter() - start, offloaded, e)
+                raise
+            request_.ctx.schema_elapsed = elapsed = time.perf_counter() - start
+            if on_validated is not None:
+                on_validated(schema_cls, elapsed, offloaded)
             return await func(*args, **kwargs)
 
         @wraps(func)
@@ -144,8 +533,17 @@ def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = t
             """
             校验post的json格式和类型是否正确
             """
-
-            g.json = verify_schema(schema_cls, request.json, required, excluded, is_extends, schema_message)
+            start = time.perf_counter()
+            try:
+                g.json = verify_schema(schema_cls, _request_json(lambda: request.json, request.get_data),
+                                       required, excluded, is_extends, schema_message, partial)
+            except Exception as e:
+                if on_invalid is not None:
+                    on_invalid(schema_cls, time.perf_counter() - start, False, e)
+                raise
+            g.schema_elapsed = elapsed = time.perf_counter() - start
+            if on_validated is not None:
+                on_validated(schema_cls, elapsed, False)
             return func(*args, **kwargs)
 
         return _async_wrapper if is_async is True else _wrapper
@@ -155,38 +553,55 @@ def _schema_validated(schema_cls: Type[Schema], required: Union[Tuple, List] = t
 
 def sanic_schema_validate(schema_cls: Type[Schema], required: Union[Tuple, List] = tuple(),
                           is_extends: bool = True, excluded: Union[Tuple, List] = tuple(),
-                          message: Dict = None) -> Callable:
+                          message: Dict = None, offload_size: Optional[int] = 256 * 1024,
+                          on_validated: Optional[Callable] = None, from_body: bool = False,
+                          partial: bool = False, on_invalid: Optional[Callable] = None) -> Callable:
     """
     校验post的json格式和类型是否正确
 
-    用于sanic框架
+    用于sanic框架,校验耗时保存在request.ctx.schema_elapsed中
     Args:
         schema_cls: 定义的schema对象
         required: 需要标记require的字段
         excluded: 排除不需要的字段
         is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
         message: 提示消息
+        offload_size: 请求body的字节数超过该值时在线程池中解析和校验,避免阻塞事件循环,默认256K,None表示不启用
+        on_validated: 校验完成后的回调, on_validated(schema_cls, elapsed, offloaded), elapsed为校验耗时,单位秒
+        from_body: 是否直接使用json_loads解析request.body,不经过框架的json解析
+        partial: 是否部分更新,为True时只校验提交的字段,主要用于PATCH请求
+        on_invalid: 校验失败时的回调, on_invalid(schema_cls, elapsed, offloaded, error), error为抛出的异常
     Returns:
     """
-    return _schema_validated(schema_cls, required, is_extends, excluded, message=message)
+    return _schema_validated(schema_cls, required, is_extends, excluded, message=message,
+                             offload_size=offload_size, on_validated=on_validated, from_body=from_body,
+                             partial=partial, on_invalid=on_invalid)
 
 
 def flask_schema_validate(schema_cls: Type[Schema], required: Union[Tuple, List] = tuple(),
                           is_extends: bool = True, excluded: Union[Tuple, List] = tuple(),
-                          message: Dict = None) -> Callable:
+                          message: Dict = None, on_validated: Optional[Callable] = None,
+                          from_body: bool = False, partial: bool = False,
+                          on_invalid: Optional[Callable] = None) -> Callable:
     """
     校验post的json格式和类型是否正确
 
-    用于flask框架
+    用于flask框架,校验耗时保存在g.schema_elapsed中
     Args:
         schema_cls: 定义的schema对象
         required: 需要标记require的字段
         excluded: 排除不需要的字段
         is_extends: 是否继承schemea本身其他字段的require属性， 默认继承
         message: 提示消息
+        on_validated: 校验完成后的回调, on_validated(schema_cls, elapsed, offloaded), elapsed为校验耗时,单位秒
+        from_body: 是否直接使用json_loads解析request.get_data(),不经过框架的json解析
+        partial: 是否部分更新,为True时只校验提交的字段,主要用于PATCH请求
+        on_invalid: 校验失败时的回调, on_invalid(schema_cls, elapsed, offloaded, error), error为抛出的异常
     Returns:
     """
-    return _schema_validated(schema_cls, required, is_extends, excluded, is_async=False, message=message)
+    return _schema_validated(schema_cls, required, is_extends, excluded, is_async=False, message=message,
+                             on_validated=on_validated, from_body=from_body, partial=partial,
+                             on_invalid=on_invalid)
 
 
 def schema2swagger(schema_cls: Schema, excluded: Union[Tuple, List] = tuple(),
@@ -198,7 +613,7 @@ def schema2swagger(schema_cls: Schema, excluded: Union[Tuple, List] = tuple(),
         excluded: 排除那些字段不需要展示
         require_only: 仅需要展示的字段
     Returns:
-        返回swagger json body doc.JsonBody
+        返回swagger json body doc.JsonBody, 同样参数的结果会被缓存
     """
     try:
         from sanic_openapi import doc
@@ -223,6 +638,11 @@ def schema2swagger(schema_cls: Schema, excluded: Union[Tuple, List] = tuple(),
     if not isinstance(excluded, (tuple, list)):
         raise FuncArgsError(message="excluded type error!")
 
+    cache_key = (schema_cls, tuple(excluded), tuple(require_only))
+    json_body = _swagger_cache.get(cache_key)
+    if json_body is not None:
+        return json_body
+
     def iter_schema(sub_schema_cls, iter_once=False):
         """
         递归处理每个迭代子集
@@ -315,11 +735,168 @@ def schema2swagger(schema_cls: Schema, excluded: Union[Tuple, List] = tuple(),
             return doc.Dictionary(description=verbose_name, required=obj_required)
 
     result = iter_schema(schema_cls)
-    return doc.JsonBody(result)
+    json_body = _swagger_cache[cache_key] = doc.JsonBody(result)
+    return json_body
+
+
+def _nested_schema_cls(field_obj: fields.Nested, parent_cls: Type[Schema]) -> Type[Schema]:
+    """
+    获取嵌套字段对应的schema类,nested可以是类、实例、类名、"self"或者返回这些的函数
+    """
+    nested = field_obj.nested
+    if callable(nested) and not isinstance(nested, type):
+        nested = nested()
+    if nested == "self":
+        return parent_cls
+    if isinstance(nested, str):
+        return cast(Type[Schema], class_registry.get_class(nested))
+    return nested if isinstance(nested, type) else type(nested)
+
+
+def _openapi_field(field_obj: fields.Field, parent_cls: Type[Schema], components: Dict) -> Dict:
+    """
+    转换单个字段为OpenAPI 3的schema
+    Args:
+        field_obj: 字段对象
+        parent_cls: 字段所在的schema类
+        components: 嵌套的schema,{schema名称: schema}
+    Returns:
+
+    """
+    field_schema: Dict[str, Any]
+    for field_cls, openapi_type in _OPENAPI_FIELD_MAP:
+        if isinstance(field_obj, field_cls):
+            field_schema = dict(openapi_type)
+            break
+    else:
+        if isinstance(field_obj, fields.Nested):
+            field_schema = _openapi_ref(_nested_schema_cls(field_obj, parent_cls), components)
+            if field_obj.many:
+                field_schema = {"type": "array", "items": field_schema}
+        elif isinstance(field_obj, fields.List):
+            # marshmallow低版本中为container
+            inner = getattr(field_obj, "inner", None) or getattr(field_obj, "container", None)
+            field_schema = {"type": "array",
+                            "items": {} if inner is None else _openapi_field(inner, parent_cls, components)}
+        elif isinstance(field_obj, fields.Tuple):
+            field_schema = {"type": "array", "items": {}}
+        elif isinstance(field_obj, fields.Mapping):
+            field_schema = {"type": "object"}
+            # marshmallow低版本中为value_container
+            value_field = getattr(field_obj, "value_field", None) or getattr(field_obj, "value_container", None)
+            if value_field is not None:
+                field_schema["additionalProperties"] = _openapi_field(value_field, parent_cls, components)
+        else:  # Raw等没有对应类型的字段
+            field_schema = {}
+
+    extras: Dict = {}
+    verbose_name = field_obj.metadata.get("verbose_name")
+    if verbose_name:
+        extras["description"] = verbose_name
+    if field_obj.allow_none:
+        extras["nullable"] = True
+    if field_obj.dump_only:
+        extras["readOnly"] = True
+    if extras and "$ref" in field_schema:  # OpenAPI 3.0中$ref的其他属性会被忽略
+        field_schema = {"allOf": [field_schema]}
+    field_schema.update(extras)
+    return field_schema
+
+
+def _openapi_object(schema_cls: Type[Schema], components: Dict, excluded: Tuple = tuple(),
+                    require_only: Tuple = tuple()) -> Dict:
+    """
+    转换schema类为OpenAPI 3的object schema
+    """
+    if not (isinstance(schema_cls, type) and issubclass(schema_cls, Schema)):
+        raise FuncArgsError("schema_cls must be sub clss of Schema.")
+    properties, required = {}, []
+    for key, field_obj in getattr(schema_cls, "_declared_fields", {}).items():
+        if require_only and key not in require_only:  # require_only 和 excluded互斥
+            continue
+        elif key in ("created_time", "updated_time", *excluded):  # 过滤掉时间字段
+            continue
+        name = field_obj.data_key or key
+        properties[name] = _openapi_field(field_obj, schema_cls, components)
+        if field_obj.required:
+            required.append(name)
+    object_schema = {"type": "object", "properties": properties}
+    if required:
+        object_schema["required"] = required
+    return object_schema
+
 
+def _openapi_name(schema_cls: Type[Schema]) -> str:
+    """
+    schema类在components中的名称,默认为类名
+
+    不同模块中的同名类、gen_schema生成的同名类使用模块名加类名,仍然重复时再加上序号,同一个类的名称始终不变
+    """
+    with _openapi_names_lock:
+        name: Optional[str] = _openapi_names.get(schema_cls)
+        if name is None:
+            qualified_name = "{}.{}".format(schema_cls.__module__, schema_cls.__name__)
+            candidates = itertools.chain((schema_cls.__name__, qualified_name),
+                                         ("{}_{}".format(qualified_name, index) for index in itertools.count(2)))
+            name = next(candidate for candidate in candidates if _openapi_name_classes.get(candidate) is None)
+            _openapi_names[schema_cls] = name
+            _openapi_name_classes[name] = schema_cls
+        return name
+
+
+def _openapi_ref(schema_cls: Type[Schema], components: Dict) -> Dict:
+    """
+    嵌套的schema放到components中,返回对应的$ref,同一个schema只转换一次,包含自身的嵌套也只需要引用自身
+    """
+    name = _openapi_name(schema_cls)
+    if name not in components:
+        components[name] = {}  # 先占位,处理包含自身的嵌套
+        components[name] = _openapi_object(schema_cls, components)
+    return {"$ref": "#/components/schemas/{}".format(name)}
+
+
+def schema2openapi(schema_cls: Type[Schema], excluded: Union[Tuple, List] = tuple(),
+                   require_only: Union[Tuple, List] = tuple(),
+                   components: Optional[Dict] = None) -> Dict:
+    """
+    转换schema为OpenAPI 3的JSON Schema,不依赖sanic-openapi
+
+    嵌套的schema不会内联展开,而是放到components中通过$ref引用,同一个嵌套schema在整个文档中只出现一次,
+    名称默认为类名,不同的类同名时使用模块名加类名区分。
+    同样参数的结果会被缓存,返回的对象是共享的,不要修改
+    eg:
+        components = {}
+        request_body = {"content": {"application/json": {"schema": schema2openapi(UserSchema, components=components)}}}
+        spec["components"] = {"schemas": components}
+    Args:
+        schema_cls: schema class
+        excluded: 排除那些字段不需要展示,只作用于最外层的schema
+        require_only: 仅需要展示的字段,只作用于最外层的schema
+        components: 收集嵌套schema的字典,{schema名称: schema},生成整个文档时多个schema共用一个
+    Returns:
+        OpenAPI 3 schema object
+    """
+    if not isinstance(require_only, (tuple, list)):
+        raise FuncArgsError(message="require_only type error!")
+    if not isinstance(excluded, (tuple, list)):
+        raise FuncArgsError(message="excluded type error!")
 
-def gen_schema(schema_cls: Type[Schema], class_suffix: str = None, table_suffix: str = None,
-               table_name: str = None, field_mapping: Dict[str, str] = None,
+    cache_key = (schema_cls, tuple(excluded), tuple(require_only))
+    cached_result = _openapi_cache.get(cache_key)
+    if cached_result is None:
+        nested_components: Dict = {}
+        object_schema = _openapi_object(schema_cls, nested_components, tuple(excluded), tuple(require_only))
+        # 同时缓存嵌套的schema类,缓存的结果还在使用时名称不会被其他类占用
+        nested_classes = tuple(_openapi_name_classes.get(name) for name in nested_components)
+        cached_result = _openapi_cache[cache_key] = (object_schema, nested_components, nested_classes)
+    object_schema, nested_components, _ = cached_result
+    if components is not None:
+        components.update(nested_components)
+    return object_schema
+
+
+def gen_schema(schema_cls: Type[Schema], class_suffix: Optional[str] = None, table_suffix: Optional[str] = None,
+               table_name: Optional[str] = None, field_mapping: Optional[Dict[str, str]] = None,
                schema_fields: Optional[Sequence] = None):
     """
     用于根据现有的schema生成新的schema类
@@ -338,7 +915,8 @@ def gen_schema(schema_cls: Type[Schema], class_suffix: str = None, table_suffix:
         schema_fields: 生成新的schema类时的字段多少,如果字段比schema_cls类中的多,则按照schema_cls中的字段为准,
                 如果字段比schema_cls类中的少,则以schema_fields中的为准
     Returns:
-        新生成的schema类
+        新生成的schema类,生成的类会被缓存,最多缓存GEN_SCHEMA_CACHE_SIZE个;
+        生成的类不会注册到marshmallow的class_registry中,Nested中不能通过类名字符串引用
     """
     if not issubclass(schema_cls, Schema):
         raise ValueError("schema_cls must be Schema type.")
@@ -352,26 +930,90 @@ def gen_schema(schema_cls: Type[Schema], class_suffix: str = None, table_suffix:
     if table_suffix:
         table_name = f"{table_name}_{table_suffix}"
 
-    if getattr(schema_cls, "_cache_class", None) is None:
-        setattr(schema_cls, "_cache_class", {})
+    field_mapping = {} if not isinstance(field_mapping, MutableMapping) else field_mapping
+    schema_fields = tuple() if not isinstance(
+        schema_fields, MutableSequence) else (*schema_fields, *field_mapping.keys())
+    key = (schema_cls, class_name, table_name, tuple(field_mapping.items()), schema_fields)
 
-    schema_cls_ = getattr(schema_cls, "_cache_class").get(class_name, None)
+    schema_cls_ = _gen_schema_cache.get(key)
     if schema_cls_ is None:
-        attr_fields = {}
-        field_mapping = {} if not isinstance(field_mapping, MutableMapping) else field_mapping
-        schema_fields = tuple() if not isinstance(
-            schema_fields, MutableSequence) else (*schema_fields, *field_mapping.keys())
-        for attr_name, attr_field in getattr(schema_cls, "_declared_fields", {}).items():
-            if schema_fields and attr_name not in schema_fields:
-                continue
-            attr_field = copy.copy(attr_field)
-            setattr(attr_field, "attribute", field_mapping.get(attr_name))
-            attr_fields[attr_name] = attr_field
-        schema_cls_ = type(class_name, (Schema,), {
-            "__doc__": schema_cls.__doc__,
-            "__tablename__": table_name,
-            "__module__": schema_cls.__module__,
-            **attr_fields})
-        getattr(schema_cls, "_cache_class")[class_name] = schema_cls_
+        # 同一个key只生成一次,不同的key之间不会互相等待
+        with _gen_schema_locks[hash(key) % len(_gen_schema_locks)]:
+            schema_cls_ = _gen_schema_cache.get(key)
+            if schema_cls_ is None:
+                attr_fields = {}
+                for attr_name, attr_field in getattr(schema_cls, "_declared_fields", {}).items():
+                    if schema_fields and attr_name not in schema_fields:
+                        continue
+                    attr_field = copy.copy(attr_field)
+                    setattr(attr_field, "attribute", field_mapping.get(attr_name))
+                    attr_fields[attr_name] = attr_field
+                # 不注册到marshmallow的class_registry中,否则缓存淘汰后生成的类也不会被释放
+                schema_cls_ = type(class_name, (Schema,), {
+                    "__doc__": schema_cls.__doc__,
+                    "__tablename__": table_name,
+                    "__module__": schema_cls.__module__,
+                    "Meta": type("Meta", (), {"register": False}),
+                    **attr_fields})
+                _gen_schema_cache[key] = schema_cls_
 
     return schema_cls_
+
+
+def pregen_schemas(schema_cls: Type[Schema], suffixes: Iterable[str], table_name: Optional[str] = None,
+                   field_mapping: Optional[Dict[str, str]] = None,
+                   schema_fields: Optional[Sequence] = None) -> Dict[str, Type[Schema]]:
+    """
+    启动时按照后缀批量预先生成分表的schema类
+
+    类名后缀和表名后缀都使用suffix,和gen_schema(schema_cls, class_suffix=suffix, table_suffix=suffix)一致
+    eg:
+        pregen_schemas(OrderSchema, ["20201012", "20201013"])
+    Args:
+        schema_cls: 要生成分表的schema类
+        suffixes: 后缀列表
+        table_name: 如果指定了table name则使用,否则使用schema_cls的table name
+        field_mapping: 字段映射,字段别名
+        schema_fields: 生成新的schema类时的字段
+    Returns:
+        {suffix: 新生成的schema类}
+    """
+    return {suffix: gen_schema(schema_cls, class_suffix=suffix, table_suffix=suffix, table_name=table_name,
+                               field_mapping=field_mapping, schema_fields=schema_fields)
+            for suffix in suffixes}
+
+
+if __name__ == '__main__':
+    import timeit
+
+    _WideSchema = type("WideSchema", (Schema,), {
+        **{"str_{}".format(i): fields.String(required=True) for i in range(60)},
+        **{"int_{}".format(i): fields.Integer(required=True) for i in range(60)},
+    })
+    _patch_data = {"str_1": "a", "str_30": "b", "int_2": 3, "int_50": 4, "id": 1}
+    _schema_obj = _WideSchema(unknown=EXCLUDE)
+    assert verify_schema(_WideSchema, _patch_data, partial=True) == _schema_obj.load(_patch_data, partial=True)
+    # required中的字段部分更新时仍然必须提交
+    try:
+        verify_schema(_WideSchema, {"str_1": "a"}, required=["int_0"], partial=True)
+    except HttpError as _err:
+        assert _err.error == {"int_0": [_schema_obj.fields["int_0"].error_messages["required"]]}
+    else:
+        raise AssertionError("int_0 is required")
+
+    class _TimeSchema(Schema):
+        created = fields.DateTime()
+        day = fields.Date()
+        at = fields.Time()
+
+    _properties = schema2openapi(_TimeSchema)["properties"]
+    assert _properties["created"]["format"] == "date-time"
+    assert _properties["day"]["format"] == "date"
+    assert "format" not in _properties["at"]
+
+    for _name, _func in (
+            ("marshmallow", lambda: _schema_obj.load(_patch_data, partial=True)),
+            ("partial=True", lambda: verify_schema(_WideSchema, _patch_data, partial=True))):
+        _number = 20000
+        _elapsed = min(timeit.repeat(_func, number=_number, repeat=3))
+        print("{:<14} {:>8.2f}us".format(_name, _elapsed / _number * 1e6))